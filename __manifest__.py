@@ -15,7 +15,7 @@
     # Check https://github.com/odoo/odoo/blob/17.0/odoo/addons/base/data/ir_module_category_data.xml
     # for the full list
     'category': 'Naidash',
-    'version': '0.1',
+    'version': '0.2',
 
     # any module necessary for this one to work correctly
     'depends': ['base', 'contacts', 'auth_signup', 'mail'],
@@ -23,8 +23,9 @@
     # always loaded
     'data': [
         # 'security/groups.xml',
-        # 'security/ir.model.access.csv',
+        'security/ir.model.access.csv',
         # 'data/ir_sequence_data.xml',
+        'data/ir_cron.xml',
         'views/partner.xml',
         'views/settings.xml',
         'views/security_notification_template.xml'
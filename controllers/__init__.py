@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+from . import preflight
 from . import partner_category
 from . import partner
 from . import user
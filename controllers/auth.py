@@ -1,31 +1,44 @@
 import json
 import logging
-import odoo
-import psycopg2
+import math
+import time
 
 from odoo import http
 from odoo.http import request, route, Response
 from odoo.exceptions import AccessError, UserError, AccessDenied
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
 from datetime import datetime, timedelta
 
 # Properly import the model
 from ..models.auth import NaidashAuth as NaidashAuthModel
+from ..models.tenant_http import tenant_http_pool
+from ..models.circuit_breaker import tenant_circuit_breakers
+from ..models.role_resolver import role_resolver
+from ..models.rate_limiter import auth_rate_limits
+from .preflight import CORS_HEADERS
 
 logger = logging.getLogger(__name__)
 naidash_auth = NaidashAuthModel()
 
+# Overall time budget, in seconds, for all the calls made to a tenant container during one login
+TENANT_LOGIN_TIMEOUT = 10
+
+# Most queries the central login may run on the request cursor once the credentials are checked:
+# the user row, its partner row, the base.group_system membership, the user context and the
+# session token computed when the session is rotated. The group and context lookups are
+# ORM-cached, so a warm worker usually stays well below this
+CENTRAL_LOGIN_QUERY_BUDGET = 5
+
+# Runs the independent tenant lookups of a login concurrently
+tenant_lookup_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='naidash_tenant_lookup')
+
 class NaidashAuthController(http.Controller):
     @route('/api/v1/auth/login', methods=['POST', 'OPTIONS'], type='http', auth="none", csrf=False, cors="*")
     def login(self, **kw):
         """Handle login requests and OPTIONS for CORS"""
-        headers = {
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Credentials': 'true',
-            'Access-Control-Allow-Methods': 'POST, OPTIONS',
-            'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Business-ID'
-        }
+        headers = CORS_HEADERS
         
-        # Handle OPTIONS request for CORS
+        # Preflights are answered before routing, see preflight.py. This only serves plain OPTIONS calls
         if request.httprequest.method == 'OPTIONS':
             return Response(status=200, headers=headers)
         
@@ -39,6 +52,16 @@ class NaidashAuthController(http.Controller):
             login = params.get('login')
             password = params.get('password')
             
+            # Reject abusive callers before doing any database work
+            retry_after = auth_rate_limits.check(
+                request.env, 'login',
+                ip=request.httprequest.remote_addr,
+                login=login,
+                business_id=request.httprequest.headers.get('X-Business-ID')
+            )
+            if retry_after is not None:
+                return self._too_many_requests(headers, retry_after, data.get('id', None))
+            
             if not login or not password:
                 return Response(
                     json.dumps({
@@ -66,14 +89,11 @@ class NaidashAuthController(http.Controller):
                 
                 # Get tenant details from partner data
                 try:
-                    partner = request.env['res.partner'].sudo().search([
-                        ('business_id', '=', business_id),
-                        ('company_type', '=', 'company')
-                    ], limit=1)
+                    tenant_route = request.env['res.partner'].sudo()._get_tenant_route(business_id)
                     
-                    if partner:
-                        tenant_database = partner.partner_database_name
-                        tenant_id = partner.partner_primary_id
+                    if tenant_route:
+                        tenant_database = tenant_route.database
+                        tenant_id = tenant_route.primary_id
                         logger.info(f"Found tenant database: {tenant_database}, tenant ID: {tenant_id}")
                         
                         # Use direct database connection for tenant database
@@ -83,7 +103,7 @@ class NaidashAuthController(http.Controller):
                                 tenant_database.lower(), 
                                 login, 
                                 password, 
-                                business_id
+                                tenant_route
                             )
                             
                             if check_tenant_container.get('success'):
@@ -121,69 +141,62 @@ class NaidashAuthController(http.Controller):
                         headers=headers
                     )
 
-                # Setup session
+                # Setup session. authenticate() already bound request.env to the user on the request cursor
                 request.session.db = db
-                registry = odoo.modules.registry.Registry(db)
-                with registry.cursor() as cr:
-                    env = odoo.api.Environment(cr, request.session.uid, request.session.context)
-                    if not request.db and not request.session.is_explicit:
-                        # Rotate the session
-                        http.root.session_store.rotate(request.session, env)
-                        
-                        # Set session cookie
-                        cookie_expiry_date = datetime.now() + timedelta(hours=2)
-                        request.future_response.set_cookie(
-                            'session_id', request.session.sid,
-                            max_age=http.SESSION_LIFETIME, httponly=True,
-                            expires=cookie_expiry_date
-                        )
-                    
-                    # Get user info
-                    user = request.env.user
-                    results = env['ir.http'].session_info()
-                    
-                    # Prepare success response
-                    response_data = {
-                        "jsonrpc": "2.0",
-                        "id": data.get('id', None),
-                        "result": {
-                            "code": 200,
-                            "message": "Logged in successfully",
-                            "data": {
-                                "id": results.get("uid"),
-                                "uid": results.get("uid"),
-                                "username": login,
-                                "partner_id": results.get("partner_id"),
-                                "name": user.name,
-                                "is_admin": user.has_group('base.group_system'),
-                                "is_system": user.has_group('base.group_system'),
-                                "user_context": results.get("user_context"),
-                                "db": db,
-                                "session_id": request.session.sid
-                            }
-                        }
-                    }
+                env = request.env
+                query_count = env.cr.sql_log_count
+                
+                if not request.db and not request.session.is_explicit:
+                    # Rotate the session
+                    http.root.session_store.rotate(request.session, env)
                     
-                    # Create response with session cookie
-                    response = Response(
-                        json.dumps(response_data),
-                        status=200,
-                        content_type='application/json',
-                        headers=headers
+                    # Set session cookie
+                    cookie_expiry_date = datetime.now() + timedelta(hours=2)
+                    request.future_response.set_cookie(
+                        'session_id', request.session.sid,
+                        max_age=http.SESSION_LIFETIME, httponly=True,
+                        expires=cookie_expiry_date
                     )
-                    
-                    # Ensure session cookie is set
-                    response.set_cookie(
-                        'session_id', 
-                        request.session.sid,
-                        max_age=http.SESSION_LIFETIME, 
-                        httponly=True,
-                        secure=request.httprequest.environ.get('HTTPS', False),
-                        samesite='None' if request.httprequest.environ.get('HTTPS', False) else None
+                
+                # Prepare success response
+                user = env.user
+                response_data = {
+                    "jsonrpc": "2.0",
+                    "id": data.get('id', None),
+                    "result": {
+                        "code": 200,
+                        "message": "Logged in successfully",
+                        "data": self._central_login_data(env, login, db, request.session.sid)
+                    }
+                }
+                
+                login_queries = env.cr.sql_log_count - query_count
+                if login_queries > CENTRAL_LOGIN_QUERY_BUDGET:
+                    logger.warning(
+                        f"Central login for {login} ran {login_queries} queries, "
+                        f"over the budget of {CENTRAL_LOGIN_QUERY_BUDGET}"
                     )
-                    
-                    logger.info(f"Login successful for user {login} (uid: {results.get('uid')})")
-                    return response
+                
+                # Create response with session cookie
+                response = Response(
+                    json.dumps(response_data),
+                    status=200,
+                    content_type='application/json',
+                    headers=headers
+                )
+                
+                # Ensure session cookie is set
+                response.set_cookie(
+                    'session_id', 
+                    request.session.sid,
+                    max_age=http.SESSION_LIFETIME, 
+                    httponly=True,
+                    secure=request.httprequest.environ.get('HTTPS', False),
+                    samesite='None' if request.httprequest.environ.get('HTTPS', False) else None
+                )
+                
+                logger.info(f"Login successful for user {login} (uid: {user.id})")
+                return response
                     
             except Exception as e:
                 logger.error(f"General authentication error: {str(e)}")
@@ -220,236 +233,338 @@ class NaidashAuthController(http.Controller):
                 headers=headers
             )
     
-    def _try_direct_tenant_auth(self, tenant_db, login, password, business_id):
-        """Try to authenticate directly to tenant database using HTTP request to tenant container"""
-        import requests
+    def _central_login_data(self, env, login, db, session_id):
+        """User details returned by a central login, part of the CENTRAL_LOGIN_QUERY_BUDGET"""
+        user = env.user
+        is_system = user._is_system()
         
-        try:
-            # Find tenant port from database
-            partner = request.env['res.partner'].sudo().search([
-                ('business_id', '=', business_id),
-                ('company_type', '=', 'company')
-            ], limit=1)
-            
-            if not partner:
-                return {'success': False, 'message': 'Tenant not found'}
-            
-            # Use direct container authentication via HTTP request to tenant container
-            tenant_url = f"http://localhost:{partner.port}/web/session/authenticate"
-            
-            logger.info(f"Trying direct container auth to {tenant_url} with user {login}")
-            
-            payload = {
+        return {
+            "id": user.id,
+            "uid": user.id,
+            "username": login,
+            "partner_id": user.partner_id.id,
+            "name": user.name,
+            "is_admin": is_system,
+            "is_system": is_system,
+            "user_context": dict(env['res.users'].context_get()),
+            "db": db,
+            "session_id": session_id
+        }
+    
+    def _too_many_requests(self, headers, retry_after, request_id=None):
+        """Build the 429 response returned to rate limited callers"""
+        return Response(
+            json.dumps({
                 "jsonrpc": "2.0",
-                "id": 123456,
-                "params": {
-                    "db": tenant_db,
-                    "login": login,
-                    "password": password
+                "id": request_id,
+                "error": {
+                    "code": 429,
+                    "message": "Too many requests, please try again later"
                 }
+            }),
+            status=429,
+            content_type='application/json',
+            headers=dict(headers, **{'Retry-After': str(math.ceil(retry_after))})
+        )
+    
+    def _try_direct_tenant_auth(self, tenant_db, login, password, tenant_route):
+        """Try to authenticate directly to tenant database using HTTP request to tenant container.
+        Calls are guarded by the circuit breaker of the tenant container so that a dead tenant fails fast
+        """
+        if not tenant_route:
+            return {'success': False, 'message': 'Tenant not found'}
+        
+        self._configure_tenant_breakers()
+        breaker = tenant_circuit_breakers.get(f"{tenant_route.business_id}:{tenant_route.port}")
+        
+        if not breaker.allow_request():
+            logger.warning(f"Skipping direct container auth for {tenant_route.business_id}: circuit breaker is open")
+            return {'success': False, 'message': 'Tenant is temporarily unavailable'}
+        
+        try:
+            result = self._authenticate_on_tenant(tenant_db, login, password, tenant_route)
+        except Exception as e:
+            breaker.record_failure()
+            logger.exception(f"Direct tenant authentication error: {str(e)}")
+            return {'success': False, 'message': str(e)}
+        
+        if result.get('status', 200) >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        
+        return result
+
+    def _configure_tenant_breakers(self):
+        """Apply the circuit breaker thresholds from the system parameters"""
+        config = request.env['ir.config_parameter'].sudo()
+        
+        tenant_circuit_breakers.configure(
+            failure_threshold=int(config.get_param('naidash_auth.tenant_breaker_failure_threshold', 5)),
+            recovery_timeout=float(config.get_param('naidash_auth.tenant_breaker_recovery_timeout', 30)),
+            half_open_max_calls=int(config.get_param('naidash_auth.tenant_breaker_half_open_max_calls', 1))
+        )
+
+    def _authenticate_on_tenant(self, tenant_db, login, password, tenant_route):
+        """Authenticate on the tenant container and collect the user's roles"""
+        tenant_port = tenant_route.port
+        deadline = time.monotonic() + TENANT_LOGIN_TIMEOUT
+        
+        # Use direct container authentication via the pooled HTTP session of the tenant container
+        logger.info(f"Trying direct container auth on port {tenant_port} with user {login}")
+        
+        payload = {
+            "jsonrpc": "2.0",
+            "id": 123456,
+            "params": {
+                "db": tenant_db,
+                "login": login,
+                "password": password
             }
-            
-            # Make request to tenant container
-            response = requests.post(
-                tenant_url, 
-                json=payload,
-                headers={'Content-Type': 'application/json'},
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                if result.get('result'):
-                    logger.info(f"Direct container auth successful for {login} on {tenant_db}")
-                    
-                    # Extract session ID from cookies
-                    session_id = None
-                    if 'session_id' in response.cookies:
-                        session_id = response.cookies['session_id']
-                    
-                    # Get user data from result
-                    user_data = result.get('result')
-                    
-                    # Initialize roles variables
-                    user_roles = []
-                    user_role = None
-                    
-                    # If we have a session and user_id, fetch groups and tags
-                    if session_id and user_data.get('uid'):
-                        # Include session in cookies for subsequent requests
-                        cookies = {'session_id': session_id}
-                        
-                        # 1. Fetch user groups
-                        groups_url = f"http://localhost:{partner.port}/web/dataset/call_kw"
-                        groups_payload = {
-                            "jsonrpc": "2.0",
-                            "id": 123457,
-                            "params": {
-                                "model": "res.users",
-                                "method": "get_groups_for_external_api",
-                                "args": [user_data.get('uid')],
-                                "kwargs": {}
-                            }
-                        }
-                        
-                        # Make the request to get groups
-                        groups_response = requests.post(
-                            groups_url,
-                            json=groups_payload,
-                            headers={'Content-Type': 'application/json'},
-                            cookies=cookies,
-                            timeout=10
-                        )
-                        
-                        # Extract roles from groups response
-                        if groups_response.status_code == 200:
-                            groups_result = groups_response.json()
-                            if groups_result.get('result'):
-                                # Process groups into roles
-                                groups = groups_result.get('result', [])
-                                for group in groups:
-                                    role_name = group.get('name')
-                                    if isinstance(role_name, dict) and 'en_US' in role_name:
-                                        role_name = role_name['en_US']
-                                    
-                                    # Add to roles array
-                                    user_roles.append({"role": role_name})
-                                    
-                                    # Determine primary role
-                                    if role_name.lower() == 'admin' or role_name.lower() == 'administrator':
-                                        user_role = "Admin"
-                                    elif role_name.lower() == 'client' and not user_role:
-                                        user_role = "Client"
-                                    elif role_name.lower() == 'dispatcher' and not user_role:
-                                        user_role = "Dispatcher"
-                                    elif role_name.lower() == 'rider' and not user_role:
-                                        user_role = "Rider"
-                        
-                        # 2. Fetch partner tags directly
-                        if user_data.get('partner_id'):
-                            partner_id = user_data.get('partner_id')
-                            tags_url = f"http://localhost:{partner.port}/web/dataset/call_kw"
-                            tags_payload = {
-                                "jsonrpc": "2.0",
-                                "id": 123458,
-                                "params": {
-                                    "model": "res.partner",
-                                    "method": "read",
-                                    "args": [[partner_id], ['category_id']],
-                                    "kwargs": {}
-                                }
-                            }
-                            
-                            # Make the request to get partner category IDs
-                            tags_response = requests.post(
-                                tags_url,
-                                json=tags_payload,
-                                headers={'Content-Type': 'application/json'},
-                                cookies=cookies,
-                                timeout=10
-                            )
-                            
-                            # Process tag names
-                            if tags_response.status_code == 200:
-                                tags_result = tags_response.json()
-                                if tags_result.get('result') and tags_result['result']:
-                                    category_ids = tags_result['result'][0].get('category_id', [])
-                                    
-                                    if category_ids:
-                                        # Get tag names
-                                        tag_names_payload = {
-                                            "jsonrpc": "2.0",
-                                            "id": 123459,
-                                            "params": {
-                                                "model": "res.partner.category",
-                                                "method": "read",
-                                                "args": [category_ids, ['name']],
-                                                "kwargs": {}
-                                            }
-                                        }
-                                        
-                                        tag_names_response = requests.post(
-                                            tags_url,
-                                            json=tag_names_payload,
-                                            headers={'Content-Type': 'application/json'},
-                                            cookies=cookies,
-                                            timeout=10
-                                        )
-                                        
-                                        if tag_names_response.status_code == 200:
-                                            tag_names_result = tag_names_response.json()
-                                            if tag_names_result.get('result'):
-                                                for tag in tag_names_result['result']:
-                                                    tag_name = tag.get('name')
-                                                    if isinstance(tag_name, dict) and 'en_US' in tag_name:
-                                                        tag_name = tag_name['en_US']
-                                                    
-                                                    # Add to roles array
-                                                    user_roles.append({"role": tag_name})
-                                                    
-                                                    # Determine primary role from tag name (prioritize tags)
-                                                    if tag_name.lower() in ['admin', 'administrator']:
-                                                        user_role = "Admin"
-                                                    elif tag_name.lower() == 'client' and not user_role:
-                                                        user_role = "Client" 
-                                                    elif tag_name.lower() == 'dispatcher' and not user_role:
-                                                        user_role = "Dispatcher"
-                                                    elif tag_name.lower() == 'rider' and not user_role:
-                                                        user_role = "Rider"
-                    
-                    # If no specific role found but user is admin, set admin role
-                    if not user_role and user_data.get('is_admin'):
-                        user_role = "Admin"
-                    elif not user_role:
-                        user_role = "User"  # Default fallback
-                    
-                    # If no roles found, create a minimal role array with the primary role
-                    if not user_roles:
-                        user_roles = [{"role": user_role}]
+        }
+        
+        # Make request to tenant container
+        response = tenant_http_pool.post(
+            tenant_port,
+            "/web/session/authenticate",
+            json=payload,
+            timeout=self._time_left(deadline)
+        )
+        
+        if response.status_code == 200:
+            result = response.json()
+            if result.get('result'):
+                logger.info(f"Direct container auth successful for {login} on {tenant_db}")
+                
+                # Extract session ID from cookies
+                session_id = None
+                if 'session_id' in response.cookies:
+                    session_id = response.cookies['session_id']
+                
+                # Get user data from result
+                user_data = result.get('result')
+                
+                # Initialize roles variables, without any group or tag the resolver falls back to Admin or User
+                user_roles = []
+                user_role = role_resolver.resolve([], user_data.get('is_admin'))
+                
+                # If we have a session and user_id, fetch groups, tags and the role in one hop
+                if session_id and user_data.get('uid'):
+                    # Include session in cookies for subsequent requests
+                    cookies = {'session_id': session_id}
+                    bundle = self._fetch_tenant_login_bundle(tenant_port, cookies, deadline)
                     
-                    # Return session information with roles
-                    return {
-                        'success': True,
+                    if bundle is not None:
+                        user_data.update({
+                            key: value for key, value in bundle.items()
+                            if key in ('uid', 'partner_id', 'name', 'is_admin', 'is_system', 'user_context')
+                        })
+                        user_roles = bundle.get('roles', [])
+                        user_role = bundle.get('role', user_role)
+                    else:
+                        # Tenants running an older build of this module have no login bundle
+                        user_roles, user_role = self._fetch_tenant_roles(tenant_port, cookies, user_data, deadline)
+                
+                # If no roles found, create a minimal role array with the primary role
+                if not user_roles:
+                    user_roles = [{"role": user_role}]
+                
+                # Return session information with roles
+                return {
+                    'success': True,
+                    'data': {
+                        'code': 200,
+                        'message': 'Logged in successfully',
                         'data': {
-                            'code': 200,
-                            'message': 'Logged in successfully',
-                            'data': {
-                                'id': user_data.get('uid'),
-                                'uid': user_data.get('uid'),
-                                'username': login,
-                                'partner_id': user_data.get('partner_id'),
-                                'name': user_data.get('name', ''),
-                                'is_admin': user_data.get('is_admin', False),
-                                'is_system': user_data.get('is_system', False),
-                                'user_context': user_data.get('user_context', {}),
-                                'db': tenant_db,
-                                'session_id': session_id,
-                                'role': user_role,  # Add primary role
-                                'roles': user_roles  # Add roles array
-                            }
+                            'id': user_data.get('uid'),
+                            'uid': user_data.get('uid'),
+                            'username': login,
+                            'partner_id': user_data.get('partner_id'),
+                            'name': user_data.get('name', ''),
+                            'is_admin': user_data.get('is_admin', False),
+                            'is_system': user_data.get('is_system', False),
+                            'user_context': user_data.get('user_context', {}),
+                            'db': tenant_db,
+                            'session_id': session_id,
+                            'role': user_role,  # Add primary role
+                            'roles': user_roles  # Add roles array
                         }
                     }
-                else:
-                    logger.warning(f"Direct container auth failed for {login} on {tenant_db}: Invalid response")
-                    return {'success': False, 'message': 'Invalid authentication response'}
+                }
             else:
-                logger.warning(f"Direct container auth failed with status {response.status_code}")
-                return {'success': False, 'message': f'Authentication request failed: {response.status_code}'}
-                
-        except Exception as e:
-            logger.exception(f"Direct tenant authentication error: {str(e)}")
-            return {'success': False, 'message': str(e)}
+                logger.warning(f"Direct container auth failed for {login} on {tenant_db}: Invalid response")
+                return {'success': False, 'message': 'Invalid authentication response'}
+        else:
+            logger.warning(f"Direct container auth failed with status {response.status_code}")
+            return {
+                'success': False,
+                'status': response.status_code,
+                'message': f'Authentication request failed: {response.status_code}'
+            }
+
+    def _time_left(self, deadline):
+        """Seconds left before the tenant login deadline"""
+        remaining = deadline - time.monotonic()
+        
+        if remaining <= 0:
+            raise TimeoutError("Tenant login deadline exceeded")
+        
+        return remaining
+
+    def _fetch_tenant_login_bundle(self, port, cookies, deadline):
+        """Fetch the user's groups, tags and primary role from the tenant in a single call.
+        Returns None when the tenant doesn't provide the login bundle
+        """
+        bundle_payload = {
+            "jsonrpc": "2.0",
+            "id": 123457,
+            "params": {
+                "model": "res.users",
+                "method": "get_login_bundle",
+                "args": [],
+                "kwargs": {}
+            }
+        }
+        
+        bundle_response = tenant_http_pool.post(
+            port,
+            "/web/dataset/call_kw",
+            json=bundle_payload,
+            cookies=cookies,
+            timeout=self._time_left(deadline)
+        )
+        
+        if bundle_response.status_code == 200:
+            bundle_result = bundle_response.json()
+            if bundle_result.get('result'):
+                return bundle_result['result']
+            
+            logger.warning(f"Login bundle unavailable on port {port}: {bundle_result.get('error')}")
+        
+        return None
+
+    def _fetch_tenant_roles(self, port, cookies, user_data, deadline):
+        """Fetch the user's groups and partner tags concurrently and derive the roles from them"""
+        group_names_future = tenant_lookup_executor.submit(
+            self._fetch_tenant_group_names, port, cookies, user_data.get('uid'), deadline
+        )
+        tag_names_future = tenant_lookup_executor.submit(
+            self._fetch_tenant_tag_names, port, cookies, user_data.get('partner_id'), deadline
+        )
+        
+        done, not_done = wait(
+            [group_names_future, tag_names_future],
+            timeout=self._time_left(deadline),
+            return_when=FIRST_EXCEPTION
+        )
+        
+        if not_done:
+            raise TimeoutError("Tenant login deadline exceeded while fetching the roles")
+        
+        role_names = group_names_future.result() + tag_names_future.result()
+        user_roles = [{"role": role_name} for role_name in role_names]
+        user_role = role_resolver.resolve(
+            role_names,
+            user_data.get('is_admin'),
+            request.env['res.users'].sudo()._get_role_priority()
+        )
+        
+        return user_roles, user_role
+
+    def _tenant_call_kw(self, port, cookies, deadline, request_id, model, method, args):
+        """Call a model method on the tenant container and return its result, or None on failure"""
+        call_kw_payload = {
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "params": {
+                "model": model,
+                "method": method,
+                "args": args,
+                "kwargs": {}
+            }
+        }
+        
+        call_kw_response = tenant_http_pool.post(
+            port,
+            "/web/dataset/call_kw",
+            json=call_kw_payload,
+            cookies=cookies,
+            timeout=self._time_left(deadline)
+        )
+        
+        if call_kw_response.status_code == 200:
+            return call_kw_response.json().get('result')
+        
+        return None
+
+    def _fetch_tenant_group_names(self, port, cookies, uid, deadline):
+        """Fetch the names of the user's groups from the tenant container"""
+        groups = self._tenant_call_kw(
+            port, cookies, deadline, 123457,
+            "res.users", "get_groups_for_external_api", [uid]
+        ) or []
+        
+        return [self._translated_name(group.get('name')) for group in groups]
+
+    def _fetch_tenant_tag_names(self, port, cookies, partner_id, deadline):
+        """Fetch the names of the partner tags from the tenant container"""
+        if not partner_id:
+            return []
+        
+        partners = self._tenant_call_kw(
+            port, cookies, deadline, 123458,
+            "res.partner", "read", [[partner_id], ['category_id']]
+        )
+        category_ids = partners[0].get('category_id', []) if partners else []
+        
+        if not category_ids:
+            return []
+        
+        tags = self._tenant_call_kw(
+            port, cookies, deadline, 123459,
+            "res.partner.category", "read", [category_ids, ['name']]
+        ) or []
+        
+        return [self._translated_name(tag.get('name')) for tag in tags]
+
+    def _translated_name(self, name):
+        """Return the English value of a translatable name"""
+        if isinstance(name, dict) and 'en_US' in name:
+            return name['en_US']
+        
+        return name
+
+    @route('/api/v1/auth/tenant_health', methods=['GET'], auth='user', type='http')
+    def tenant_health(self, **kw):
+        """Report the tenant circuit breakers and HTTP session pool of this worker"""
+        headers = [('Content-Type', 'application/json')]
+        
+        if not request.env.user._is_system():
+            data = json.dumps({
+                "error": {
+                    "code": 403,
+                    "message": "Permission denied.Contact your administrator for assistance"
+                }
+            })
+            return request.make_response(data, headers, status=403)
+        
+        data = json.dumps({
+            "result": {
+                "code": 200,
+                "message": "Success",
+                "data": {
+                    "circuit_breakers": tenant_circuit_breakers.snapshot(),
+                    "http_pool": tenant_http_pool.stats()
+                }
+            }
+        })
+        return request.make_response(data, headers, status=200)
 
     @route('/api/v1/auth/logout', methods=['GET', 'OPTIONS'], type='http', auth="none", csrf=False, cors="*")
     def logout(self, **kw):
-        headers = {
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Credentials': 'true',
-            'Access-Control-Allow-Methods': 'GET, OPTIONS',
-            'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Business-ID'
-        }
+        headers = CORS_HEADERS
         
-        # Handle OPTIONS request for CORS
+        # Preflights are answered before routing, see preflight.py. This only serves plain OPTIONS calls
         if request.httprequest.method == 'OPTIONS':
             return Response(status=200, headers=headers)
             
@@ -511,14 +626,9 @@ class NaidashAuthController(http.Controller):
     
     @route('/api/v1/auth/forgot_password', methods=['POST', 'OPTIONS'], auth='public', type='http', csrf=False, cors="*")
     def generate_auth_token(self, **kw):
-        headers = {
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Credentials': 'true',
-            'Access-Control-Allow-Methods': 'POST, OPTIONS',
-            'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Business-ID'
-        }
+        headers = CORS_HEADERS
         
-        # Handle OPTIONS request for CORS
+        # Preflights are answered before routing, see preflight.py. This only serves plain OPTIONS calls
         if request.httprequest.method == 'OPTIONS':
             return Response(status=200, headers=headers)
                           
@@ -526,6 +636,15 @@ class NaidashAuthController(http.Controller):
             data = json.loads(request.httprequest.data.decode('utf-8'))
             email = data.get("email")
             
+            # Reject abusive callers before doing any database work
+            retry_after = auth_rate_limits.check(
+                request.env, 'forgot_password',
+                ip=request.httprequest.remote_addr,
+                login=email
+            )
+            if retry_after is not None:
+                return self._too_many_requests(headers, retry_after)
+            
             if not email:
                 return Response(
                     json.dumps({
@@ -568,18 +687,21 @@ class NaidashAuthController(http.Controller):
             
     @route('/api/v1/auth/reset_password', methods=['POST', 'OPTIONS'], auth='public', type='http', csrf=False, cors="*")
     def reset_user_password(self, **kw):
-        headers = {
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Credentials': 'true',
-            'Access-Control-Allow-Methods': 'POST, OPTIONS',
-            'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Business-ID'
-        }
+        headers = CORS_HEADERS
         
-        # Handle OPTIONS request for CORS
+        # Preflights are answered before routing, see preflight.py. This only serves plain OPTIONS calls
         if request.httprequest.method == 'OPTIONS':
             return Response(status=200, headers=headers)
                           
         try:
+            # Reject abusive callers before doing any database work
+            retry_after = auth_rate_limits.check(
+                request.env, 'reset_password',
+                ip=request.httprequest.remote_addr
+            )
+            if retry_after is not None:
+                return self._too_many_requests(headers, retry_after)
+            
             data = json.loads(request.httprequest.data.decode('utf-8'))
             
             if not data.get("token") or not data.get("password"):
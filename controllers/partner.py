@@ -1,12 +1,15 @@
 # -*- coding: utf-8 -*-
 import json
 import logging
+import math
 
 from odoo import http
 from odoo.http import request, route, SessionExpiredException
 from odoo.service import security
 from odoo.service.security import check_session
 
+from ..models.rate_limiter import auth_rate_limits
+
 logger = logging.getLogger(__name__)
 
 class NaidashPartner(http.Controller):
@@ -17,7 +20,12 @@ class NaidashPartner(http.Controller):
         """ 
 
         try:            
-            request_data = json.loads(request.httprequest.data)                        
+            request_data = json.loads(request.httprequest.data)
+            
+            # Tenant provisioning takes minutes, companies are created by a background job
+            if request_data.get("account_type") == "company":
+                return request.env['naidash.tenant.job'].submit(request_data)
+            
             partner_details = request.env['res.partner'].create_the_partner(request_data)
             return partner_details
         except Exception as e:
@@ -91,52 +99,123 @@ class NaidashPartner(http.Controller):
         
     
     
+    @route('/api/v1/partner/job/<int:job_id>', methods=['GET'], auth='user', type='http')
+    def get_partner_job(self, job_id):
+        """Get the status of a company creation job
+        """ 
+                
+        headers = [('Content-Type', 'application/json')]
+        
+        try:
+            job_details = request.env['naidash.tenant.job'].get_the_job(job_id)
+            status_code = job_details.get("code")
+            
+            if status_code == 404:
+                data = json.dumps(
+                    {
+                        "error": job_details
+                    }
+                )
+
+                return request.make_response(data, headers, status=status_code)
+            else:
+                data = json.dumps(
+                    {
+                        "result": job_details
+                    }
+                )
+
+                return request.make_response(data, headers, status=status_code)
+        except Exception as e:
+            logger.exception(f"The following error occurred while fetching the partner job:\n\n{str(e)}")
+            data = json.dumps(
+                {
+                    "error": {
+                        "code": 500,
+                        "message": str(e)
+                    }
+                }
+            )
+            
+            return request.make_response(data, headers, status=500)
+    
+    @route('/api/v1/partner/provisioning_metrics', methods=['GET'], auth='user', type='http')
+    def get_provisioning_metrics(self, days=30, **kw):
+        """Get the duration histograms of the tenant provisioning stages
+        """ 
+                
+        headers = [('Content-Type', 'application/json')]
+        
+        if not request.env.user._is_system():
+            data = json.dumps({
+                "error": {
+                    "code": 403,
+                    "message": "Permission denied.Contact your administrator for assistance"
+                }
+            })
+            return request.make_response(data, headers, status=403)
+        
+        try:
+            metrics = request.env['naidash.tenant.stage.timing'].get_stage_histograms(days=int(days))
+            data = json.dumps(
+                {
+                    "result": metrics
+                }
+            )
+
+            return request.make_response(data, headers, status=metrics.get("code"))
+        except Exception as e:
+            logger.exception(f"The following error occurred while fetching the provisioning metrics:\n\n{str(e)}")
+            data = json.dumps(
+                {
+                    "error": {
+                        "code": 500,
+                        "message": str(e)
+                    }
+                }
+            )
+            
+            return request.make_response(data, headers, status=500)
+    
     @route('/api/v1/tenant/lookup/<string:business_id>', methods=['GET'], auth='public', type='http')
     def lookup_tenant(self, business_id):
         """Look up tenant details by business ID"""
         headers = [('Content-Type', 'application/json')]
         
         try:
-            # Search for the tenant in res.partner with sudo() to bypass access rights
-            tenant = request.env['res.partner'].sudo().search([
-                ('business_id', '=', business_id),
-                ('is_company', '=', True)
-            ], limit=1)
+            # Reject abusive callers before doing any database work
+            retry_after = auth_rate_limits.check(
+                request.env, 'tenant_lookup',
+                ip=request.httprequest.remote_addr,
+                business_id=business_id
+            )
+            if retry_after is not None:
+                return request.make_response(json.dumps({
+                    'code': 429,
+                    'message': 'Too many requests, please try again later'
+                }), headers + [('Retry-After', str(math.ceil(retry_after)))], status=429)
 
-            if not tenant:
+            # Resolve the tenant from the cached routing table, then load its record by primary key
+            tenant_route = request.env['res.partner'].sudo()._get_tenant_route(business_id)
+
+            if not tenant_route:
                 logger.warning(f'No tenant found for business_id: {business_id}')
                 return request.make_response(json.dumps({
                     'code': 404,
                     'message': 'Tenant not found'
                 }), headers)
 
+            tenant = request.env['res.partner'].sudo().browse(tenant_route.partner_id)
+
             # Generate database name based on partner's record
-            tenant_database = tenant.partner_database_name
+            tenant_database = tenant_route.database
             if not tenant_database:
                 # Fallback to generating database name
                 timestamp = tenant.create_date.strftime('%d%m%Y%H%M') if tenant.create_date else ''
                 tenant_database = f'tdb_{business_id}_{timestamp}'
 
-            # Get port from database configuration
-            try:
-                with open('/etc/nginx/conf.d/tenant_ports.conf', 'r') as f:
-                    port_config = f.read()
-                    # Parse the port from config using regex
-                    import re
-                    port_match = re.search(rf'{business_id}\s+(\d+);', port_config)
-                    tenant_port = port_match.group(1) if port_match else None
-            except Exception as e:
-                logger.error(f'Error reading port configuration: {str(e)}')
-                tenant_port = None
-
-            # If port not found in config, generate dynamically starting from 8071
-            if not tenant_port:
-                base_port = 8071
-                tenant_count = request.env['res.partner'].sudo().search_count([
-                    ('is_company', '=', True),
-                    ('create_date', '<=', tenant.create_date)
-                ])
-                tenant_port = base_port + (tenant_count - 1)
+            # Port comes from the port registry
+            tenant_port = tenant_route.port
 
             tenant_details = {
                 'tenant_id': tenant.partner_primary_id or business_id,
@@ -151,17 +230,6 @@ class NaidashPartner(http.Controller):
                 'is_active': bool(tenant.active)
             }
 
-            # Add to port configuration if not exists
-            try:
-                if not port_match:
-                    with open('/etc/nginx/conf.d/tenant_ports.conf', 'a') as f:
-                        f.write(f'\n    {business_id}     {tenant_port};')
-                    # Reload Nginx configuration
-                    import subprocess
-                    subprocess.run(['sudo', 'nginx', '-s', 'reload'])
-            except Exception as e:
-                logger.error(f'Error updating port configuration: {str(e)}')
-
             logger.info(f'Tenant lookup successful for {business_id}: {tenant_details}')
             
             return request.make_response(json.dumps({
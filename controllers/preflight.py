@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+import inspect
+import logging
+
+from odoo import http
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import Map, Rule
+
+logger = logging.getLogger(__name__)
+
+PREFLIGHT_PATH_PREFIX = '/api/v1/'
+
+# Browsers cap the preflight cache (Chromium at 2 hours), longer values are not useful
+PREFLIGHT_MAX_AGE = 7200
+
+# Credentials are never allowed with a wildcard origin, browsers reject that combination
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, POST, PATCH, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Business-ID'
+}
+
+# Routes of this module declared with `cors`, mapped on the first preflight once every controller is loaded
+_cors_routes = None
+
+
+def _get_cors_routes():
+    global _cors_routes
+
+    if _cors_routes is None:
+        module = __name__.split('.')[2]
+        rules = []
+
+        for controller_class in http.Controller.children_classes.get(module, []):
+            for _name, method in inspect.getmembers(controller_class, inspect.isfunction):
+                routing = getattr(method, 'original_routing', None) or {}
+
+                if routing.get('cors'):
+                    rules += [
+                        Rule(path, endpoint=(routing['cors'], tuple(routing.get('methods') or ())))
+                        for path in routing['routes'] if path.startswith(PREFLIGHT_PATH_PREFIX)
+                    ]
+
+        _cors_routes = Map(rules)
+
+    return _cors_routes
+
+
+def _preflight_headers(environ):
+    """Headers answering the preflight of a `cors` route, None for the routes declared without it"""
+    try:
+        (origin, methods), _args = _get_cors_routes().bind('', path_info=environ.get('PATH_INFO', '')).match()
+    except HTTPException:
+        return None
+
+    headers = [
+        ('Access-Control-Allow-Origin', origin),
+        ('Access-Control-Allow-Methods', ", ".join(methods) if methods else CORS_HEADERS['Access-Control-Allow-Methods']),
+        ('Access-Control-Allow-Headers', CORS_HEADERS['Access-Control-Allow-Headers']),
+        ('Access-Control-Max-Age', str(PREFLIGHT_MAX_AGE)),
+        ('Content-Length', '0')
+    ]
+    if origin != '*':
+        headers.append(('Access-Control-Allow-Credentials', 'true'))
+
+    return headers
+
+
+def _is_preflight(environ):
+    return (
+        environ.get('REQUEST_METHOD') == 'OPTIONS'
+        and environ.get('PATH_INFO', '').startswith(PREFLIGHT_PATH_PREFIX)
+        and 'HTTP_ACCESS_CONTROL_REQUEST_METHOD' in environ
+    )
+
+
+def _serve_preflight(application_call):
+    """Answer the CORS preflight requests of this module's `cors` routes before Odoo routes them,
+    so that they never load a session nor open a database cursor. Other preflights go through Odoo
+    """
+    def __call__(self, environ, start_response):
+        if _is_preflight(environ):
+            headers = _preflight_headers(environ)
+
+            if headers is not None:
+                start_response('204 No Content', headers)
+                return []
+
+        return application_call(self, environ, start_response)
+
+    __call__.naidash_preflight = True
+    return __call__
+
+
+if not getattr(http.Application.__call__, 'naidash_preflight', False):
+    http.Application.__call__ = _serve_preflight(http.Application.__call__)
+    logger.info(f"CORS preflight requests of the cors routes under {PREFLIGHT_PATH_PREFIX} are answered before routing")
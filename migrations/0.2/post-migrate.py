@@ -0,0 +1,10 @@
+from odoo import api, SUPERUSER_ID
+
+
+def migrate(cr, version):
+    """Register the ports of the tenants created before the port registry, the routing table only reads it"""
+    if not version:
+        return
+
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env['res.partner']._register_legacy_ports()
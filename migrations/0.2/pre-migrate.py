@@ -0,0 +1,40 @@
+import logging
+
+from odoo.tools.sql import column_exists
+
+logger = logging.getLogger(__name__)
+
+# Columns that get a unique constraint in 0.2, see res.partner `_sql_constraints`
+UNIQUE_COLUMNS = ('business_id', 'partner_database_name')
+
+
+def migrate(cr, version):
+    """Clear the duplicate business IDs and tenant databases, Odoo would only log that the unique
+    constraints could not be created. The active company created first keeps the value
+    """
+    if not version:
+        return
+
+    for column in UNIQUE_COLUMNS:
+        if not column_exists(cr, 'res_partner', column):
+            continue
+
+        cr.execute(f"""
+            WITH ranked AS (
+                SELECT id, {column} AS value,
+                       row_number() OVER (
+                           PARTITION BY {column}
+                           ORDER BY is_company DESC NULLS LAST, active DESC NULLS LAST, id
+                       ) AS rank
+                  FROM res_partner
+                 WHERE {column} IS NOT NULL
+            )
+            UPDATE res_partner partner
+               SET {column} = NULL
+              FROM ranked
+             WHERE ranked.id = partner.id AND ranked.rank > 1
+            RETURNING partner.id, ranked.value
+        """)
+
+        for partner_id, value in cr.fetchall():
+            logger.warning(f"Cleared duplicate {column} {value} of partner {partner_id}, check which tenant it belongs to")
@@ -4,4 +4,19 @@ from . import settings
 from . import partner_category
 from . import partner
 from . import user
-from . import auth
\ No newline at end of file
+from . import group
+from . import auth
+from . import tenant_http
+from . import circuit_breaker
+from . import role_resolver
+from . import rate_limiter
+from . import negative_cache
+from . import tenant_job
+from . import tenant_pool
+from . import readiness
+from . import docker_client
+from . import tenant_stage_timing
+from . import process_output
+from . import tenant_teardown
+from . import admin_pg
+from . import tenant_port
\ No newline at end of file
@@ -0,0 +1,133 @@
+import logging
+import os
+import threading
+import time
+import psycopg2
+
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+ADMIN_DATABASE = 'postgres'
+
+
+class AdminConnectionPool:
+    """Process-wide pool of autocommit admin connections to the local PostgreSQL server.
+
+    Only connections to the `postgres` maintenance database are pooled: tenant databases
+    get dropped and renamed, a pooled connection to one of them would block that. The
+    role that managed to connect (`postgres`, then the system user) is remembered so
+    that later connections skip the failing attempt.
+    """
+
+    def __init__(self, host='localhost', max_connections=4, idle_timeout=300):
+        self.host = host
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self._user = None
+        self._idle = deque()
+        self._size = 0
+        self._pid = None
+        self._condition = threading.Condition()
+
+    def _candidate_users(self):
+        users = [self._user] if self._user else []
+        users += [user for user in ('postgres', os.getenv('USER')) if user and user not in users]
+        return users
+
+    def _connect(self, dbname):
+        """Open a connection with the first role that works, starting with the remembered one"""
+        password = os.environ.get('PGPASSWORD', 'postgres')
+        error = None
+
+        for user in self._candidate_users():
+            try:
+                conn = psycopg2.connect(dbname=dbname, user=user, password=password, host=self.host)
+            except psycopg2.OperationalError as e:
+                logger.warning(f"Failed to connect as {user} user: {str(e)}")
+                error = e
+                continue
+
+            conn.autocommit = True
+
+            if self._user != user:
+                logger.info(f"Admin PostgreSQL connections use the {user} role")
+                self._user = user
+
+            return conn
+
+        logger.error(f"Failed to connect to PostgreSQL: {str(error)}")
+        raise error
+
+    def _reset_after_fork(self):
+        """Connections inherited from the parent process must not be shared. The condition lock must be held"""
+        if self._pid != os.getpid():
+            self._idle.clear()
+            self._size = 0
+            self._pid = os.getpid()
+
+    def _acquire(self):
+        with self._condition:
+            self._reset_after_fork()
+
+            while True:
+                while self._idle:
+                    conn, released_at = self._idle.pop()
+
+                    if not conn.closed and time.monotonic() - released_at < self.idle_timeout:
+                        return conn
+
+                    conn.close()
+                    self._size -= 1
+
+                if self._size < self.max_connections:
+                    self._size += 1
+                    break
+
+                self._condition.wait()
+
+        try:
+            return self._connect(ADMIN_DATABASE)
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+
+    def _release(self, conn, broken=False):
+        with self._condition:
+            if broken or conn.closed:
+                conn.close()
+                self._size -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self, dbname=ADMIN_DATABASE):
+        """Yield an autocommit admin connection to `dbname`, pooled for the `postgres` database"""
+        if dbname != ADMIN_DATABASE:
+            conn = self._connect(dbname)
+            try:
+                yield conn
+            finally:
+                conn.close()
+            return
+
+        conn = self._acquire()
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            self._release(conn, broken=True)
+            raise
+        except BaseException:
+            self._release(conn)
+            raise
+        else:
+            self._release(conn)
+
+
+# Shared by the tenant provisioning, cleanup and maintenance code of this worker process
+admin_connections = AdminConnectionPool()
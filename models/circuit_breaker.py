@@ -0,0 +1,145 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Closed/open/half-open circuit breaker guarding the calls made to one tenant container.
+
+    The breaker opens after `failure_threshold` consecutive failures and rejects
+    calls for `recovery_timeout` seconds. It then lets up to `half_open_max_calls`
+    trial calls through: a successful trial closes it again, a failed one re-opens it.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=5, recovery_timeout=30, half_open_max_calls=1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._half_open_calls = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    def _current_state(self):
+        """Return the state, moving an expired open breaker to half-open. The lock must be held"""
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._half_open_calls = 0
+            logger.info(f"Circuit breaker {self.name} is half-open")
+
+        return self._state
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def allow_request(self):
+        """Return True when a call may go through, False when it must fail fast"""
+        with self._lock:
+            state = self._current_state()
+
+            if state == self.CLOSED:
+                return True
+
+            if state == self.HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+                self._half_open_calls += 1
+                return True
+
+            self._rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"Circuit breaker {self.name} is closed")
+
+            self._state = self.CLOSED
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+
+            if self._current_state() == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"Circuit breaker {self.name} is open after {self._failures} failure(s)")
+
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def snapshot(self):
+        """Return the breaker state for monitoring"""
+        with self._lock:
+            state = self._current_state()
+            retry_in = None
+
+            if state == self.OPEN:
+                retry_in = round(self.recovery_timeout - (time.monotonic() - self._opened_at), 1)
+
+            return {
+                "state": state,
+                "failures": self._failures,
+                "rejected": self._rejected,
+                "retry_in": retry_in
+            }
+
+
+class CircuitBreakerRegistry:
+    """Per-worker collection of circuit breakers sharing the same thresholds"""
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30, half_open_max_calls=1):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._breakers = dict()
+        self._lock = threading.Lock()
+
+    def configure(self, failure_threshold, recovery_timeout, half_open_max_calls):
+        """Apply new thresholds to the existing and future breakers"""
+        with self._lock:
+            self.failure_threshold = failure_threshold
+            self.recovery_timeout = recovery_timeout
+            self.half_open_max_calls = half_open_max_calls
+
+            for breaker in self._breakers.values():
+                breaker.failure_threshold = failure_threshold
+                breaker.recovery_timeout = recovery_timeout
+                breaker.half_open_max_calls = half_open_max_calls
+
+    def get(self, name):
+        """Return the breaker of `name`, creating a closed one if needed"""
+        with self._lock:
+            breaker = self._breakers.get(name)
+
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    name,
+                    failure_threshold=self.failure_threshold,
+                    recovery_timeout=self.recovery_timeout,
+                    half_open_max_calls=self.half_open_max_calls
+                )
+                self._breakers[name] = breaker
+
+            return breaker
+
+    def snapshot(self):
+        """Return the state of every breaker for monitoring"""
+        with self._lock:
+            breakers = list(self._breakers.values())
+
+        return {breaker.name: breaker.snapshot() for breaker in breakers}
+
+
+# Shared by every request handled in this worker process
+tenant_circuit_breakers = CircuitBreakerRegistry()
@@ -0,0 +1,200 @@
+import http.client
+import json
+import logging
+import socket
+import struct
+import threading
+
+from collections import namedtuple
+from urllib.parse import quote, urlencode
+
+logger = logging.getLogger(__name__)
+
+DOCKER_SOCKET = '/var/run/docker.sock'
+
+# Lowest API version with everything used here, served by every supported Docker Engine
+DOCKER_API_VERSION = 'v1.41'
+
+# Header of a frame in a multiplexed exec stream: stream type (1 stdout, 2 stderr), padding, payload size
+STREAM_HEADER = struct.Struct('>BxxxL')
+
+ExecResult = namedtuple('ExecResult', ['exit_code', 'stdout', 'stderr'])
+
+
+class DockerError(Exception):
+    """A Docker Engine API call failed"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection over a Unix domain socket"""
+
+    def __init__(self, socket_path, timeout=60):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+class DockerClient:
+    """Minimal Docker Engine API client speaking HTTP over the daemon's Unix socket.
+
+    Every thread keeps its own keep-alive connection, so the provisioning helpers
+    pay neither a process fork nor a CLI start-up per container check.
+    """
+
+    def __init__(self, socket_path=DOCKER_SOCKET, timeout=60, api_version=DOCKER_API_VERSION):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.api_version = api_version
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+
+        if connection is None:
+            connection = UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+            self._local.connection = connection
+
+        return connection
+
+    def _reset_connection(self):
+        connection = getattr(self._local, 'connection', None)
+
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def _request(self, method, path, body=None, params=None):
+        """Send a request and return (status, raw body). A stale keep-alive connection is retried once"""
+        url = f"/{self.api_version}{path}"
+        if params:
+            url += "?" + urlencode(params)
+
+        payload = json.dumps(body) if body is not None else None
+        headers = {'Content-Type': 'application/json'} if payload is not None else {}
+
+        for attempt in range(2):
+            connection = self._connection()
+
+            try:
+                connection.request(method, url, body=payload, headers=headers)
+                response = connection.getresponse()
+                return response.status, response.read()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError) as e:
+                self._reset_connection()
+                if attempt:
+                    raise DockerError(f"Docker API {method} {path} failed: {str(e)}") from e
+            except (OSError, http.client.HTTPException) as e:
+                self._reset_connection()
+                raise DockerError(f"Docker API {method} {path} failed: {str(e)}") from e
+
+    def _json(self, method, path, body=None, params=None, allow_not_found=False):
+        status, data = self._request(method, path, body=body, params=params)
+
+        if status == 404 and allow_not_found:
+            return None
+
+        if status >= 400:
+            raise DockerError(f"Docker API {method} {path} returned {status}: {data.decode(errors='replace').strip()}", status)
+
+        return json.loads(data) if data else None
+
+    # === Containers ===
+    def inspect_container(self, name):
+        """Return the container's inspect document, None when there is no such container"""
+        return self._json('GET', f"/containers/{quote(name)}/json", allow_not_found=True)
+
+    def container_status(self, name):
+        container = self.inspect_container(name)
+        return container['State']['Status'] if container else None
+
+    def container_running(self, name):
+        return self.container_status(name) == 'running'
+
+    def published_port(self, name, private_port, protocol='tcp'):
+        """Return the host port published for a container port, or None"""
+        container = self.inspect_container(name)
+        bindings = ((container or {}).get('NetworkSettings', {}).get('Ports') or {}).get(f"{private_port}/{protocol}")
+
+        return int(bindings[0]['HostPort']) if bindings else None
+
+    def list_containers(self, labels=None, all=True):
+        filters = {'label': [f"{key}={value}" for key, value in (labels or {}).items()]}
+        return self._json('GET', "/containers/json", params={'all': int(all), 'filters': json.dumps(filters)})
+
+    def exec_run(self, name, cmd, env=None, user=None, check=False):
+        """Run `cmd` in a running container and return an ExecResult.
+        With `check`, a non-zero exit code raises DockerError
+        """
+        config = {'Cmd': cmd, 'AttachStdout': True, 'AttachStderr': True, 'Tty': False}
+        if env:
+            config['Env'] = [f"{key}={value}" for key, value in env.items()]
+        if user:
+            config['User'] = user
+
+        exec_id = self._json('POST', f"/containers/{quote(name)}/exec", body=config)['Id']
+
+        status, data = self._request('POST', f"/exec/{exec_id}/start", body={'Detach': False, 'Tty': False})
+        if status >= 400:
+            raise DockerError(f"Failed to start exec in {name}: {data.decode(errors='replace').strip()}", status)
+
+        # The daemon closes the stream once the command exits, the next call opens a new connection
+        self._reset_connection()
+
+        stdout, stderr = self._demultiplex(data)
+        exit_code = self._json('GET', f"/exec/{exec_id}/json")['ExitCode']
+
+        if check and exit_code != 0:
+            raise DockerError(f"Command {cmd[0]} exited with {exit_code} in {name}: {stderr.strip()}")
+
+        return ExecResult(exit_code, stdout, stderr)
+
+    @staticmethod
+    def _demultiplex(data):
+        """Split a multiplexed exec stream into (stdout, stderr) strings"""
+        streams = {1: [], 2: []}
+        offset = 0
+
+        while offset + STREAM_HEADER.size <= len(data):
+            stream_type, size = STREAM_HEADER.unpack_from(data, offset)
+            offset += STREAM_HEADER.size
+            streams.get(stream_type, streams[1]).append(data[offset:offset + size])
+            offset += size
+
+        return (
+            b"".join(streams[1]).decode(errors='replace'),
+            b"".join(streams[2]).decode(errors='replace')
+        )
+
+    # === Compose projects ===
+    def remove_compose_project(self, working_dir):
+        """Stop and remove the containers and networks of the compose project started from
+        `working_dir`, like `docker-compose down`. Volumes are kept. Returns the number of containers removed
+        """
+        containers = self.list_containers(labels={'com.docker.compose.project.working_dir': working_dir})
+        projects = set()
+
+        for container in containers:
+            projects.add(container['Labels'].get('com.docker.compose.project'))
+            self._json('DELETE', f"/containers/{container['Id']}", params={'force': 1}, allow_not_found=True)
+
+        for project in filter(None, projects):
+            filters = json.dumps({'label': [f"com.docker.compose.project={project}"]})
+
+            for network in self._json('GET', "/networks", params={'filters': filters}):
+                self._json('DELETE', f"/networks/{network['Id']}", allow_not_found=True)
+
+        logger.info(f"Removed {len(containers)} container(s) of the compose project in {working_dir}")
+        return len(containers)
+
+
+# Shared by the provisioning, verification and cleanup helpers of this worker process
+docker_client = DockerClient()
@@ -0,0 +1,14 @@
+from odoo import models
+
+
+class NaidashGroup(models.Model):
+    _inherit = "res.groups"
+    
+    def write(self, vals):
+        res = super(NaidashGroup, self).write(vals)
+        
+        # The cached login roles depend on the group names and members
+        if {'name', 'users', 'implied_ids'}.intersection(vals):
+            self.env.registry.clear_cache()
+            
+        return res
@@ -0,0 +1,55 @@
+import threading
+import time
+
+from collections import OrderedDict
+
+
+class NegativeLookupCache:
+    """Bounded set of keys recently found not to exist, each remembered for `ttl` seconds.
+
+    Entries are dropped oldest first once `max_entries` is reached. The set is local
+    to the worker: `clear()` only affects the current process, other workers rely on
+    the TTL to pick up keys that started to exist.
+    """
+
+    def __init__(self, ttl=30, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            expires_at = self._entries.get(key)
+
+            if expires_at is None:
+                return False
+
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return False
+
+            return True
+
+    def add(self, key):
+        with self._lock:
+            self._entries[key] = time.monotonic() + self.ttl
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# business_id values that matched no tenant, shared by every request handled in this worker process
+unknown_business_ids = NegativeLookupCache()
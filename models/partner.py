@@ -2,6 +2,7 @@ import logging
 import shutil
 import time
 import psycopg2
+import psycopg2.errors
 import requests
 import base64
 import random
@@ -9,24 +10,72 @@ import string
 import subprocess
 import os
 import stat
+import re
+import json
+import hashlib
+from bisect import bisect_right
+from collections import namedtuple
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
-from odoo import models, _, fields, api, registry, SUPERUSER_ID
+from odoo import models, _, fields, api, registry, tools, SUPERUSER_ID
 import odoo
 from odoo.http import request, SessionExpiredException
 from odoo.exceptions import AccessDenied, AccessError, ValidationError, UserError
+from odoo.tools.sql import create_index
+
+from .negative_cache import unknown_business_ids
+from .readiness import ReadinessProbe
+from .docker_client import docker_client, DockerError
+from .process_output import OutputTail
+from .admin_pg import admin_connections
+from .tenant_port import TENANT_BASE_PORT, TENANT_PORTS_CONF, NGINX_MAP_ENTRY
 
 logger = logging.getLogger(__name__)
 
+TENANT_TEMPLATE_PREFIX = 'tenant_template_'
+DEFAULT_TENANT_MODULES = 'base,contacts,mail,naidash_auth'
+
+# Seconds to wait for the script's output after it exits, containers it started may hold its pipes open
+SCRIPT_OUTPUT_DRAIN_TIMEOUT = 5
+
+# Business ID candidates checked per query, and signups retried when a concurrent one took the same ID
+BUSINESS_ID_BATCH_SIZE = 10
+BUSINESS_ID_ALLOCATION_ATTEMPTS = 3
+
+# Anything else can't be a business ID, see `_generate_business_id`
+BUSINESS_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+# Fields whose changes invalidate the tenant routing table of every worker
+TENANT_ROUTE_FIELDS = {'business_id', 'partner_database_name', 'partner_primary_id', 'is_company', 'active'}
+
+# psql prints a line per statement without -q, the bootstrap output is read from its last line
+BOOTSTRAP_PSQL_OPTIONS = ['-X', '-q', '-tA', '-v', 'ON_ERROR_STOP=1', '--single-transaction']
+
+# Checkpoints of the tenant provisioning state machine, in order, see `_provision_tenant`
+TENANT_PROVISIONING_STEPS = [
+    ('pending', 'Pending'),
+    ('identifiers', 'Identifiers Generated'),
+    ('stack_created', 'Stack Created'),
+    ('stack_ready', 'Stack Ready'),
+    ('verified', 'Verified'),
+    ('done', 'Done')
+]
+
+TenantRoute = namedtuple(
+    'TenantRoute',
+    ['business_id', 'partner_id', 'database', 'primary_id', 'port', 'active']
+)
+
 class NaidashPartner(models.Model):
     _inherit = "res.partner"
     
     # === No changes to field definitions ===
     id_number = fields.Char(string="Identification No.")
-    partner_primary_id = fields.Char(string="Partner's Primary ID")
+    partner_primary_id = fields.Char(string="Partner's Primary ID", index='btree_not_null')
     partner_secondary_id = fields.Char(string="Partner's Secondary ID")
-    partner_database_name = fields.Char(string="Partner's Database Name")
-    business_id = fields.Char(string="Business ID", readonly=True) #Business partner_id
+    partner_database_name = fields.Char(string="Partner's Database Name", copy=False)
+    business_id = fields.Char(string="Business ID", readonly=True, copy=False) #Business partner_id
     reset_password_url = fields.Char(string='Reset Password URL')
     is_phone_number_verified = fields.Boolean(
         string = "Phone Number Verified?",
@@ -44,7 +93,179 @@ class NaidashPartner(models.Model):
         help="If set to true, the id number has been verified otherwise it's not verified"
     )
     payment_url = fields.Char(string='Payment URL')
+    tenant_provisioning_step = fields.Selection(
+        TENANT_PROVISIONING_STEPS,
+        string="Tenant Provisioning Step",
+        copy=False,
+        help="Last completed step of the tenant provisioning, the next attempt resumes after it"
+    )
+    tenant_provisioning_error = fields.Text(string="Tenant Provisioning Error", copy=False)
+    tenant_provisioning_attempts = fields.Integer(string="Tenant Provisioning Attempts", default=0, copy=False)
+    
+    _sql_constraints = [
+        ('business_id_unique', 'unique(business_id)', 'The business ID must be unique'),
+        ('partner_database_name_unique', 'unique(partner_database_name)', 'The tenant database must be unique'),
+    ]
+    
+    def init(self):
+        """Tenant lookups filter companies by business ID, a partial index keeps them off the person rows"""
+        super().init()
+        create_index(
+            self.env.cr,
+            'res_partner_company_business_id_index',
+            self._table,
+            ['business_id'],
+            where='is_company AND business_id IS NOT NULL'
+        )
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        partners = super(NaidashPartner, self).create(vals_list)
+        
+        if any(vals.get('business_id') for vals in vals_list):
+            self._invalidate_tenant_routes()
+            
+        return partners
+    
+    def write(self, vals):
+        invalidate = bool(TENANT_ROUTE_FIELDS.intersection(vals)) and (
+            vals.get('is_company') or any(partner.is_company for partner in self)
+        )
+        # The cached login roles of the partner's users depend on the partner tags
+        invalidate = invalidate or ('category_id' in vals and any(partner.user_ids for partner in self))
+        res = super(NaidashPartner, self).write(vals)
+        
+        if invalidate:
+            self._invalidate_tenant_routes()
+            
+        return res
+    
+    def unlink(self):
+        invalidate = any(partner.is_company for partner in self)
+        res = super(NaidashPartner, self).unlink()
+        
+        if invalidate:
+            self._invalidate_tenant_routes()
+            
+        return res
+    
+    # === Tenant routing ===
+    def _invalidate_tenant_routes(self):
+        """Drop the cached tenant routing table and login roles, other workers are notified through the registry signaling.
+        Unknown business IDs are only forgotten by this worker, the others let them expire
+        """
+        self.env.registry.clear_cache()
+        unknown_business_ids.clear()
+    
+    @api.model
+    def _read_tenant_ports_conf(self):
+        """Parse the nginx tenant port map into a {business_id: port} dict"""
+        try:
+            with open(TENANT_PORTS_CONF, 'r') as f:
+                return {
+                    business_id: int(port)
+                    for business_id, port in NGINX_MAP_ENTRY.findall(f.read())
+                }
+        except Exception as e:
+            logger.error(f'Error reading port configuration: {str(e)}')
+            return {}
+    
+    @api.model
+    def _register_legacy_ports(self):
+        """Move the companies created before the port registry into it, keeping the port they were reachable on:
+        the one in the nginx map, else `8071 + (active companies created before or with them) - 1`.
+        Runs from the 0.2 migration on the upgrade cursor, a company whose port is taken is logged and skipped
+        """
+        companies = self.sudo().with_context(active_test=False).search_read(
+            [('is_company', '=', True), ('business_id', '!=', False), ('tenant_provisioning_step', 'in', (False, 'done'))],
+            ['business_id', 'partner_database_name', 'active', 'create_date'],
+            order='create_date asc, id asc'
+        )
+        port_model = self.env['naidash.tenant.port'].sudo()
+        registered = port_model.search_read([], ['business_id', 'port'])
+        registered_business_ids = {assignment['business_id'] for assignment in registered}
+        taken_ports = {assignment['port'] for assignment in registered}
+        configured_ports = self._read_tenant_ports_conf()
+        active_create_dates = [company['create_date'] for company in companies if company['active']]
+        count = 0
+        
+        for company in companies:
+            business_id = company['business_id']
+            if business_id in registered_business_ids:
+                continue
+            
+            configured_port = configured_ports.get(business_id)
+            port = configured_port or TENANT_BASE_PORT + bisect_right(active_create_dates, company['create_date']) - 1
+            
+            if port in taken_ports:
+                logger.error(f"Port {port} of existing tenant {business_id} is already assigned, register it manually")
+                continue
+            
+            port_model.create({
+                'tenant_database': (company['partner_database_name'] or business_id).lower(),
+                'business_id': business_id,
+                'partner_id': company['id'],
+                'port': port,
+                'nginx_configured': configured_port is not None
+            })
+            taken_ports.add(port)
+            count += 1
+        
+        logger.info(f"Registered the ports of {count} existing tenant(s)")
+    
+    @api.model
+    @tools.ormcache()
+    def _get_tenant_routing_table(self):
+        """Build the {business_id: TenantRoute} table of every company tenant.
+        The table is loaded once per worker and served from the ORM cache until a tenant field changes,
+        ports come from the port registry, see naidash.tenant.port. Companies without a port
+        (still being provisioned) are left out
+        """
+        companies = self.sudo().with_context(active_test=False).search_read(
+            [('is_company', '=', True), ('business_id', '!=', False)],
+            ['business_id', 'partner_database_name', 'partner_primary_id', 'active'],
+            order='create_date asc, id asc'
+        )
+        ports = {
+            assignment['business_id']: assignment
+            for assignment in self.env['naidash.tenant.port'].sudo().search_read(
+                [('business_id', '!=', False)], ['business_id', 'port']
+            )
+        }
+        
+        routing_table = dict()
+        for company in companies:
+            business_id = company['business_id']
+            if not business_id or business_id not in ports:
+                continue
+            
+            routing_table[business_id] = TenantRoute(
+                business_id=business_id,
+                partner_id=company['id'],
+                database=company['partner_database_name'],
+                primary_id=company['partner_primary_id'],
+                port=ports[business_id]['port'],
+                active=company['active']
+            )
+        
+        logger.info(f"Loaded tenant routing table with {len(routing_table)} tenant(s)")
+        return routing_table
+    
+    @api.model
+    def _get_tenant_route(self, business_id):
+        """Return the TenantRoute of an active tenant or None.
+        Malformed and recently unknown business IDs are rejected without loading the routing table
+        """
+        if not business_id or not BUSINESS_ID_PATTERN.match(business_id) or business_id in unknown_business_ids:
+            return None
+        
+        route = self._get_tenant_routing_table().get(business_id)
+        
+        if route is None:
+            unknown_business_ids.add(business_id)
+            
+        return route if route and route.active else None
+    
     # === New helper methods for validation and preparation ===
     def _validate_tenant_names(self, tenant_database, tenant_id):
         """Validate tenant naming conventions"""
@@ -92,7 +313,9 @@ class NaidashPartner(models.Model):
     
         # method to generate timestamp-based identifiers
     def _generate_tenant_identifiers(self, business_id):
-        """Generate tenant identifiers using business ID and timestamp"""
+        """Generate tenant identifiers using business ID and timestamp.
+        Business IDs are unique so identifiers can't collide, the unique constraint on partner_database_name enforces it
+        """
         timestamp = datetime.now().strftime('%y%m%d%H%M')  # Format: YYMMDDHHmm
         
         # Generate identifiers
@@ -156,6 +379,10 @@ class NaidashPartner(models.Model):
     
     
     def _cleanup_failed_tenant(self, tenant_database, tenant_id):
+        """Remove a tenant's containers, directory, database and role. Returns False when a step failed.
+        Failed tenants are torn down in the background, see naidash.tenant.teardown
+        """
+        success = True
         try:
             # Get the home directory
             home_dir = os.path.expanduser('~')
@@ -165,16 +392,12 @@ class NaidashPartner(models.Model):
             
             if os.path.exists(tenant_dir):
                 try:
-                    # docker-compose operations
-                    subprocess.run(
-                        ['docker-compose', 'down'],
-                        cwd=tenant_dir,
-                        check=True,
-                        capture_output=True
-                    )
+                    # Same as `docker-compose down` in the tenant directory
+                    docker_client.remove_compose_project(tenant_dir)
                     logger.info("Docker containers stopped successfully")
-                except subprocess.CalledProcessError as e:
-                    logger.error(f"Failed to stop containers: {e.stderr}")
+                except DockerError as e:
+                    logger.error(f"Failed to stop containers: {str(e)}")
+                    success = False
                 
                 # Directory removal
                 try:
@@ -182,13 +405,11 @@ class NaidashPartner(models.Model):
                     logger.info("Tenant directory removed successfully")
                 except subprocess.CalledProcessError as e:
                     logger.error(f"Failed to remove tenant directory: {str(e)}")
+                    success = False
             
             # Database cleanup using direct postgres connection
             try:
-                conn = self._get_postgres_connection()
-                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
-                
-                with conn.cursor() as cur:
+                with self._get_postgres_connection() as conn, conn.cursor() as cur:
                     # Terminate existing connections
                     cur.execute("""
                         SELECT pg_terminate_backend(pid) 
@@ -206,14 +427,17 @@ class NaidashPartner(models.Model):
                         DROP ROLE IF EXISTS {tenant_id.lower()}
                     """)
                 
-                conn.close()
                 logger.info(f"Database cleanup completed for tenant: {tenant_database}")
                 
             except Exception as e:
                 logger.error(f"Database cleanup failed: {str(e)}")
+                success = False
                     
         except Exception as e:
             logger.error(f"Cleanup failed: {str(e)}")
+            success = False
+        
+        return success
     
     def _validate_partner_data(self, request_data):
         """Validate partner creation request data
@@ -330,8 +554,10 @@ class NaidashPartner(models.Model):
         return partner_details
 
     # === Updated tenant creation methods ===
-    def _create_tenant_with_timeout(self, script_path, tenant_database, tenant_id, tenant_password, timeout=300):
-        """Execute tenant creation with timeout and improved logging"""
+    def _create_tenant_with_timeout(self, script_path, tenant_database, tenant_id, tenant_password, timeout=300, extra_env=None, verify=True):
+        """Execute tenant creation with timeout and improved logging.
+        Without `verify` it returns as soon as the script succeeds, leaving the readiness and verification steps to the caller
+        """
         try:
             # Setup tenants directory with proper permissions
             current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -355,74 +581,76 @@ class NaidashPartner(models.Model):
                 'DB_PASSWORD': tenant_password,
                 'ODOO_ADMIN_PASSWD': tenant_password  # Add explicit admin password
             })
+            env.update(extra_env or {})
             
             logger.info(f"Starting tenant creation for {tenant_database}")
             
             # Execute script with timeout handling
             try:
-                # Start process with pipe for output
-                process = subprocess.Popen(
-                    [script_path, tenant_database.lower(), tenant_id.lower(), tenant_password],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True,
-                    env=env,
-                    cwd=root_dir
-                )
-                
-                # Handle output with timeout
-                import select
-                start_time = time.time()
-                outputs = {'stdout': [], 'stderr': []}
-                
-                while True:
-                    elapsed_time = time.time() - start_time
-                    if elapsed_time > timeout:
+                with self._provisioning_stage("running_script", tenant_database) as script_stage:
+                    # Start process with pipe for output
+                    process = subprocess.Popen(
+                        [script_path, tenant_database.lower(), tenant_id.lower(), tenant_password],
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.PIPE,
+                        text=True,
+                        env=env,
+                        cwd=root_dir
+                    )
+                    
+                    # Forward the output line by line while keeping only its tail in memory
+                    stdout_tail = OutputTail(process.stdout, lambda line: logger.info(f"Script output: {line}")).start()
+                    stderr_tail = OutputTail(process.stderr, lambda line: logger.warning(f"Script error: {line}")).start()
+                    
+                    try:
+                        return_code = process.wait(timeout=timeout)
+                    except subprocess.TimeoutExpired:
                         process.kill()
-                        logger.error(f"Process killed after {elapsed_time:.1f} seconds")
+                        process.wait()
+                        stdout_tail.join(SCRIPT_OUTPUT_DRAIN_TIMEOUT)
+                        stderr_tail.join(SCRIPT_OUTPUT_DRAIN_TIMEOUT)
+                        logger.error(f"Process killed after {timeout} seconds")
                         raise subprocess.TimeoutExpired(
                             cmd=script_path,
                             timeout=timeout,
-                            output="".join(outputs['stdout']),
-                            stderr="".join(outputs['stderr'])
+                            output=stdout_tail.text(),
+                            stderr=stderr_tail.text()
                         )
                     
-                    reads = [process.stdout.fileno(), process.stderr.fileno()]
-                    ret = select.select(reads, [], [], min(5.0, timeout - elapsed_time))
-                    
-                    if not ret[0]:  # Timeout on select
-                        continue
-                        
-                    for fd in ret[0]:
-                        if fd == process.stdout.fileno():
-                            line = process.stdout.readline()
-                            if line:
-                                logger.info(f"Script output: {line.strip()}")
-                                outputs['stdout'].append(line)
-                        if fd == process.stderr.fileno():
-                            line = process.stderr.readline()
-                            if line:
-                                logger.warning(f"Script error: {line.strip()}")
-                                outputs['stderr'].append(line)
+                    stdout_tail.join(SCRIPT_OUTPUT_DRAIN_TIMEOUT)
+                    stderr_tail.join(SCRIPT_OUTPUT_DRAIN_TIMEOUT)
                     
-                    if process.poll() is not None:
-                        break
-                        
-                return_code = process.wait()
+                    script_stage['success'] = return_code == 0
                 
                 if return_code != 0:
-                    error_msg = "".join(outputs['stderr']) or "Unknown error"
+                    error_msg = stderr_tail.text() or "Unknown error"
                     logger.error(f"Script failed with return code {return_code}: {error_msg}")
                     return {
                         "success": False,
                         "message": f"Script execution failed: {error_msg}"
                     }
                 
-                # Give containers time to stabilize
-                time.sleep(15)
+                if not verify:
+                    return {
+                        "success": True,
+                        "message": "Tenant script completed"
+                    }
+                
+                # Wait for the containers to come up instead of sleeping a fixed time
+                with self._provisioning_stage("stabilizing", tenant_database) as stage:
+                    stage['success'] = self._wait_for_tenant_ready(tenant_database)
+                
+                if not stage['success']:
+                    return {
+                        "success": False,
+                        "message": "Tenant did not become ready"
+                    }
                 
                 # Verify the tenant creation
-                if not self._verify_tenant_creation(tenant_database, tenant_id, tenant_password):
+                with self._provisioning_stage("verifying", tenant_database) as stage:
+                    stage['success'] = self._verify_tenant_creation(tenant_database, tenant_id, tenant_password)
+                
+                if not stage['success']:
                     return {
                         "success": False,
                         "message": "Tenant verification failed"
@@ -450,53 +678,70 @@ class NaidashPartner(models.Model):
             }
             
     
+    def _tenant_bootstrap_sql(self, tenant_database, tenant_id, tenant_password):
+        """Idempotent SQL that (re)creates the tenant role, grants it the database and sets the admin credentials.
+        The last statement returns the admin login so that the same round trip verifies the update
+        """
+        tenant_id = tenant_id.lower()
+        tenant_password = tenant_password.replace("'", "''")
+        
+        return f"""
+            DO $bootstrap$
+            BEGIN
+                IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = '{tenant_id}') THEN
+                    ALTER ROLE {tenant_id} WITH LOGIN PASSWORD '{tenant_password}' SUPERUSER CREATEDB CREATEROLE REPLICATION;
+                ELSE
+                    CREATE ROLE {tenant_id} WITH LOGIN PASSWORD '{tenant_password}' SUPERUSER CREATEDB CREATEROLE REPLICATION;
+                END IF;
+            END
+            $bootstrap$;
+            GRANT ALL PRIVILEGES ON DATABASE {tenant_database.lower()} TO {tenant_id};
+            UPDATE res_users SET login = '{tenant_id}', password = '{tenant_password}' WHERE id = 2;
+            SELECT login FROM res_users WHERE id = 2;
+        """
+    
+    @api.model
+    def _last_psql_line(self, output):
+        """Last non-empty line of a psql run, the result of its final statement"""
+        lines = [line.strip() for line in output.splitlines() if line.strip()]
+        return lines[-1] if lines else ''
+    
+    def _bootstrap_tenant_database(self, tenant_database, tenant_id, tenant_password):
+        """Run the bootstrap SQL in a single psql session and transaction.
+        Returns True once the admin login reads back as the tenant ID
+        """
+        try:
+            result = docker_client.exec_run(f"{tenant_database.lower()}_db", [
+                'psql', '-U', 'postgres', '-d', tenant_database.lower(), *BOOTSTRAP_PSQL_OPTIONS,
+                '-c', self._tenant_bootstrap_sql(tenant_database, tenant_id, tenant_password)
+            ], check=True)
+        except DockerError as e:
+            logger.error(f"Failed to bootstrap the tenant database: {str(e)}")
+            return False
+        
+        if self._last_psql_line(result.stdout) != tenant_id.lower():
+            logger.error("Admin credentials verification failed")
+            return False
+        
+        logger.info("✓ Tenant role and admin credentials set")
+        return True
+    
     def _verify_tenant_creation(self, tenant_database, tenant_id, tenant_password):
         """Verify tenant creation and admin password update"""
         try:
             # Check if containers are running
             container_name = f"{tenant_database.lower()}_db"
-            check_cmd = ['docker', 'ps', '--filter', f'name={container_name}', '--format', '{{.Names}}']
-            result = subprocess.run(check_cmd, capture_output=True, text=True)
             
-            if container_name not in result.stdout:
+            if not docker_client.container_running(container_name):
                 logger.error("Database container not running")
                 return False
-                
-            # Update admin credentials directly
-            update_cmd = [
-                'docker', 'exec', '-i', container_name,
-                'psql', '-U', tenant_id.lower(), '-d', tenant_database.lower(),
-                '-c', f"UPDATE res_users SET login='{tenant_id.lower()}', password='{tenant_password}' WHERE login='admin';"
-            ]
             
-            try:
-                subprocess.run(update_cmd, check=True, capture_output=True, env={'PGPASSWORD': tenant_password})
-                logger.info("✓ Admin credentials updated successfully")
-            except subprocess.CalledProcessError as e:
-                logger.error(f"Failed to update admin credentials: {e.stderr}")
+            # Set and verify the role and admin credentials in one round trip
+            if not self._bootstrap_tenant_database(tenant_database, tenant_id, tenant_password):
                 return False
-                
-            # Verify the update
-            verify_cmd = [
-                'docker', 'exec', '-i', container_name,
-                'psql', '-U', tenant_id.lower(), '-d', tenant_database.lower(),
-                '-c', "SELECT login FROM res_users WHERE id=2;"
-            ]
-            
-            result = subprocess.run(verify_cmd, capture_output=True, text=True, env={'PGPASSWORD': tenant_password})
-            
-            if tenant_id.lower() not in result.stdout:
-                logger.error("Admin credentials verification failed")
-                return False
-                
-            logger.info("✓ Admin credentials verified")
             
             # Verify Odoo service is responding
-            odoo_container = f"{tenant_database.lower()}_odoo"
-            health_cmd = ['docker', 'inspect', '--format', '{{.State.Status}}', odoo_container]
-            health_result = subprocess.run(health_cmd, capture_output=True, text=True)
-            
-            if 'running' not in health_result.stdout:
+            if not docker_client.container_running(f"{tenant_database.lower()}_odoo"):
                 logger.error("Odoo container not running properly")
                 return False
                 
@@ -507,269 +752,498 @@ class NaidashPartner(models.Model):
             logger.error(f"Verification failed: {str(e)}")
             return False
         
-    def _verify_and_fix_role(self, tenant_database, tenant_id, tenant_password):
-        """Verify and fix database role if needed"""
-        try:
-            container_name = f"{tenant_database.lower()}_db"
+    # === Tenant readiness probes ===
+    def _tenant_container_running(self, container_name):
+        return docker_client.container_running(container_name)
+    
+    def _tenant_postgres_ready(self, tenant_database):
+        result = docker_client.exec_run(
+            f'{tenant_database.lower()}_db',
+            ['pg_isready', '-U', 'postgres', '-d', tenant_database.lower()]
+        )
+        return result.exit_code == 0
+    
+    def _tenant_http_ready(self, tenant_database):
+        """Query the Odoo health endpoint on the host port published for the tenant's Odoo container"""
+        host_port = docker_client.published_port(f'{tenant_database.lower()}_odoo', 8069)
+        if not host_port:
+            return False
+        
+        response = requests.get(f"http://localhost:{host_port}/web/health", timeout=5)
+        return response.status_code == 200
+    
+    def _wait_for_tenant_ready(self, tenant_database, timeout=180):
+        """Probe the tenant containers, Postgres and Odoo HTTP health with backoff until they are all ready.
+        Returns True as soon as the last probe passes, False once `timeout` seconds are spent
+        """
+        probes = [
+            ("database container", lambda: self._tenant_container_running(f"{tenant_database.lower()}_db")),
+            ("odoo container", lambda: self._tenant_container_running(f"{tenant_database.lower()}_odoo")),
+            ("postgres", lambda: self._tenant_postgres_ready(tenant_database)),
+            ("odoo http", lambda: self._tenant_http_ready(tenant_database)),
+        ]
+        results = ReadinessProbe(timeout=timeout).run(probes)
+        
+        timings = ", ".join(f"{result.name} {result.duration:.2f}s/{result.attempts}" for result in results)
+        logger.info(f"Readiness of {tenant_database}: {timings}")
+        
+        return len(results) == len(probes) and results[-1].ready
+
+    def _get_postgres_connection(self, dbname='postgres'):
+        """Context manager yielding an autocommit admin connection to the `postgres` database, or to `dbname`.
+        Connections to `postgres` come from the worker's pool, see admin_pg.py
+        """
+        return admin_connections.connection(dbname)
+
+    # === Tenant template database ===
+    @api.model
+    def _get_tenant_modules(self):
+        """Modules installed in every tenant, from the `naidash_auth.tenant_modules` system parameter"""
+        modules = self.env['ir.config_parameter'].sudo().get_param('naidash_auth.tenant_modules', DEFAULT_TENANT_MODULES)
+        return sorted({module.strip() for module in modules.split(',') if module.strip()})
+    
+    @api.model
+    def _get_tenant_template_version(self):
+        """The template version changes whenever the tenant module set does"""
+        return hashlib.sha1(",".join(self._get_tenant_modules()).encode()).hexdigest()[:10]
+    
+    @api.model
+    def _tenant_template_enabled(self):
+        """Template databases are only built when `naidash_auth.tenant_template_enabled` is set, like the pool they cost a tenant stack.
+        Only enable it when the tenant databases live on the cluster reached through admin_connections, the template
+        is frozen and cloned there with `CREATE DATABASE ... TEMPLATE`, which cannot reach a per-tenant db container
+        """
+        return tools.str2bool(self.env['ir.config_parameter'].sudo().get_param('naidash_auth.tenant_template_enabled', 'False'))
+    
+    @api.model
+    def _get_tenant_template(self):
+        """Return the current template database details ({name, owner, version}) or None.
+        A missing or outdated template gets (re)built in the background
+        """
+        if not self._tenant_template_enabled():
+            return None
+        
+        template = json.loads(self.env['ir.config_parameter'].sudo().get_param('naidash_auth.tenant_template') or '{}')
+        
+        if template.get('version') == self._get_tenant_template_version() and self._tenant_database_exists(template['name']):
+            return template
+        
+        logger.info("Tenant template database is missing or outdated, scheduling a rebuild")
+        self.env.ref('naidash_auth.ir_cron_build_tenant_template').sudo()._trigger()
+        return None
+    
+    @api.model
+    def _tenant_database_exists(self, database_name):
+        with self._get_postgres_connection() as conn, conn.cursor() as cur:
+            cur.execute("SELECT 1 FROM pg_database WHERE datname = %s", (database_name,))
+            return bool(cur.fetchone())
+    
+    @api.model
+    def _adopt_template_objects(self, tenant_database, tenant_id, template_owner):
+        """Hand the objects cloned from the template over to the tenant's role"""
+        with self._get_postgres_connection(dbname=tenant_database.lower()) as conn, conn.cursor() as cur:
+            cur.execute(f"REASSIGN OWNED BY {template_owner} TO {tenant_id.lower()}")
+    
+    @api.model
+    def _cron_build_tenant_template(self):
+        """Build the golden tenant database for the current module set and drop the outdated ones.
+        The template is a regular tenant whose stack is removed and whose database is frozen as a template
+        """
+        if not self._tenant_template_enabled():
+            logger.info("Tenant templates are disabled, set naidash_auth.tenant_template_enabled to build them")
+            return
+        
+        version = self._get_tenant_template_version()
+        template_name = f"{TENANT_TEMPLATE_PREFIX}{version}"
+        config = self.env['ir.config_parameter'].sudo()
+        
+        if json.loads(config.get_param('naidash_auth.tenant_template') or '{}').get('version') != version \
+                or not self._tenant_database_exists(template_name):
+            tenant_id, tenant_database = self._generate_tenant_identifiers(f"tpl{version[:6]}")
             
-            # First revoke all existing privileges
-            subprocess.run([
-                'docker', 'exec', '-i', container_name,
-                'psql', '-U', 'postgres', '-d', 'postgres', '-c',
-                f"REASSIGN OWNED BY {tenant_id.lower()} TO postgres;"
-            ], check=True)
+            logger.info(f"Building tenant template {template_name} with modules {self._get_tenant_modules()}")
+            result = self._build_tenant_stack(
+                tenant_database,
+                tenant_id,
+                self._generate_tenant_password(),
+                use_template=False
+            )
             
-            # Drop and recreate role
-            subprocess.run([
-                'docker', 'exec', '-i', container_name,
-                'psql', '-U', 'postgres', '-d', 'postgres', '-c',
-                f"DROP ROLE IF EXISTS {tenant_id.lower()};"
-            ], check=True)
+            if not result["success"]:
+                logger.error(f"Tenant template build failed: {result['message']}")
+                self.env['naidash.tenant.teardown'].schedule(tenant_database, tenant_id, reason="template build failed")
+                return
             
-            # Create new role with proper permissions
-            subprocess.run([
-                'docker', 'exec', '-i', container_name,
-                'psql', '-U', 'postgres', '-d', 'postgres', '-c',
-                f"CREATE USER {tenant_id.lower()} WITH LOGIN PASSWORD '{tenant_password}' SUPERUSER CREATEDB CREATEROLE REPLICATION;"
-            ], check=True)
+            if not self._tenant_database_exists(tenant_database.lower()):
+                logger.error(
+                    f"Tenant template {tenant_database} is not on the admin cluster, "
+                    "naidash_auth.tenant_template_enabled requires the tenant databases to share it"
+                )
+                self.env['naidash.tenant.teardown'].schedule(tenant_database, tenant_id, reason="template not on the admin cluster")
+                return
             
-            # Grant specific database privileges
-            subprocess.run([
-                'docker', 'exec', '-i', container_name,
-                'psql', '-U', 'postgres', '-d', tenant_database.lower(), '-c',
-                f"GRANT ALL PRIVILEGES ON DATABASE {tenant_database.lower()} TO {tenant_id.lower()};"
-            ], check=True)
+            # Only the database is kept, the template's containers would hold connections to it
+            tenant_dir = os.path.join(os.path.expanduser('~'), 'tenants', tenant_database.lower())
+            docker_client.remove_compose_project(tenant_dir)
+            subprocess.run(['rm', '-rf', tenant_dir], check=True)
             
-            return True
-        except Exception as e:
-            logger.error(f"Error verifying/fixing role: {str(e)}")
-            return False
+            with self._get_postgres_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                        SELECT pg_terminate_backend(pid)
+                        FROM pg_stat_activity
+                        WHERE datname = %s
+                    """, (tenant_database.lower(),))
+                    cur.execute(f"DROP DATABASE IF EXISTS {template_name}")
+                    cur.execute(f"ALTER DATABASE {tenant_database.lower()} RENAME TO {template_name}")
+                    cur.execute(f"ALTER DATABASE {template_name} OWNER TO CURRENT_USER")
+                
+                # Clones get their admin credentials set by the tenant verification
+                with self._get_postgres_connection(dbname=template_name) as template_conn, template_conn.cursor() as cur:
+                    cur.execute("UPDATE res_users SET login = 'admin' WHERE id = 2")
+                
+                with conn.cursor() as cur:
+                    cur.execute(f"ALTER DATABASE {template_name} WITH IS_TEMPLATE true ALLOW_CONNECTIONS false")
+            
+            # The template never serves requests
+            self.env['naidash.tenant.port']._release(tenant_database)
+            
+            config.set_param('naidash_auth.tenant_template', json.dumps({
+                'name': template_name,
+                'owner': tenant_id.lower(),
+                'version': version
+            }))
+            logger.info(f"Tenant template {template_name} is ready")
+        
+        # Drop the templates of previous module sets
+        with self._get_postgres_connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                "SELECT datname FROM pg_database WHERE datname LIKE %s AND datname != %s",
+                (f"{TENANT_TEMPLATE_PREFIX}%", template_name)
+            )
+            for (outdated_template,) in cur.fetchall():
+                cur.execute(f"ALTER DATABASE {outdated_template} WITH IS_TEMPLATE false")
+                cur.execute(f"DROP DATABASE IF EXISTS {outdated_template}")
+                logger.info(f"Dropped outdated tenant template {outdated_template}")
     
+    def _build_tenant_stack(self, tenant_database, tenant_id, tenant_password, use_template=True, verify=True):
+        """Run the tenant creation script, cloning the tenant database from the template when there is one"""
+        script_path = self._get_script_path()
+        self._validate_script_permissions(script_path)
         
-    def _test_tenant_connection(self, tenant_database, tenant_id, tenant_password):
-        """Test tenant database connection with retries"""
-        max_attempts = 10
-        delay_seconds = 20
+        # The script publishes the tenant's Odoo container on the port assigned to it
+        tenant_port = self.env['naidash.tenant.port']._allocate(tenant_database)
+        extra_env = {
+            'TENANT_MODULES': ",".join(self._get_tenant_modules()),
+            'TENANT_PORT': str(tenant_port)
+        }
+        template = self._get_tenant_template() if use_template else None
         
-        # Add initial delay to allow for container startup
-        logger.info(f"Waiting {30} seconds for initial container setup...")
-        time.sleep(30)
+        if template:
+            # The script creates the database with `CREATE DATABASE ... TEMPLATE` instead of initialising it
+            extra_env['TENANT_TEMPLATE_DB'] = template['name']
+            logger.info(f"Cloning tenant database {tenant_database} from {template['name']}")
         
-        for attempt in range(max_attempts):
-            try:
-                logger.info(f"Connection test attempt {attempt + 1} of {max_attempts}")
+        result = self._create_tenant_with_timeout(
+            script_path,
+            tenant_database,
+            tenant_id,
+            tenant_password,
+            timeout=900,  # 15 minutes
+            extra_env=extra_env,
+            verify=verify
+        )
+        
+        if result["success"] and template:
+            self._adopt_template_objects(tenant_database, tenant_id, template['owner'])
+        
+        if result["success"]:
+            # Scripts that don't honour TENANT_PORT pick their own port
+            published_port = docker_client.published_port(f"{tenant_database.lower()}_odoo", 8069)
+            if published_port:
+                self.env['naidash.tenant.port']._update_port(tenant_database, published_port)
+        
+        return result
+    
+    def _report_provisioning_stage(self, stage):
+        """Publish the current provisioning stage on the job running this creation, if any"""
+        job_id = self.env.context.get('tenant_job_id')
+        
+        if job_id:
+            self.env['naidash.tenant.job'].browse(job_id)._report_stage(stage)
+    
+    @contextmanager
+    def _provisioning_stage(self, stage, tenant_database=None):
+        """Report a provisioning stage and persist how long it took, see naidash.tenant.stage.timing.
+        Yields a dict whose `success` key the caller sets to False when the stage fails without raising
+        """
+        self._report_provisioning_stage(stage)
+        outcome = {'success': True}
+        started_at = fields.Datetime.now()
+        start_time = time.monotonic()
+        
+        try:
+            yield outcome
+        except Exception:
+            outcome['success'] = False
+            raise
+        finally:
+            self.env['naidash.tenant.stage.timing']._record(
+                stage,
+                time.monotonic() - start_time,
+                outcome['success'],
+                started_at,
+                tenant_database=tenant_database,
+                job_id=self.env.context.get('tenant_job_id')
+            )
+            
+    # === Resumable tenant provisioning ===
+    def _checkpoint_tenant_provisioning(self, step, values=None):
+        """Record a completed provisioning step and commit it, so that it survives the failure of a later step"""
+        self.write(dict(values or {}, tenant_provisioning_step=step, tenant_provisioning_error=False))
+        self.env.cr.commit()
+        logger.info(f"Tenant provisioning of {self.business_id} reached step {step}")
+    
+    @contextmanager
+    def _tenant_provisioning_lock(self):
+        """Claim the provisioning of a company for the current job, yields False when another job holds it.
+        The session-level advisory lock survives the checkpoint commits and goes away with the connection of a dead worker
+        """
+        self.ensure_one()
+        self.env.cr.execute("SELECT pg_try_advisory_lock(hashtext('naidash_tenant_provisioning'), %s)", (self.id,))
+        locked = self.env.cr.fetchone()[0]
+        
+        try:
+            yield locked
+        finally:
+            if locked:
+                self.env.cr.execute("SELECT pg_advisory_unlock(hashtext('naidash_tenant_provisioning'), %s)", (self.id,))
+    
+    def _find_unfinished_company(self, request_data):
+        """Return the company of an earlier signup with the same email or phone whose tenant is not provisioned yet"""
+        domain = [
+            ('is_company', '=', True),
+            ('active', '=', False),
+            ('tenant_provisioning_step', 'not in', (False, 'done'))
+        ]
+        contacts = []
+        
+        if request_data.get("email"):
+            contacts.append(("email", "=ilike", request_data["email"].strip()))
+        if request_data.get("phone"):
+            contacts.append(("phone", "=", self._prepare_partner_details(request_data)["phone"]))
+        
+        if not contacts:
+            return self.browse()
+        
+        domain += ['|'] * (len(contacts) - 1) + contacts
+        return self.env['res.partner'].with_context(active_test=False).search(domain, order='id desc', limit=1)
+    
+    def _provision_tenant(self):
+        """Run the remaining provisioning steps of a company tenant, committing a checkpoint after each one.
+        A failed step is recorded on the partner and retried by the next attempt, completed steps are never redone
+        """
+        self.ensure_one()
+        
+        # Start from a fresh snapshot, a job that held the provisioning lock before may have completed steps
+        self.env.cr.commit()
+        self.invalidate_recordset()
+        
+        self.tenant_provisioning_attempts += 1
+        self.env.cr.commit()
+        
+        try:
+            if self.tenant_provisioning_step == 'pending':
+                # Take over a ready stack from the warm pool when there is one
+                pool_stack = self.env['naidash.tenant.pool'].sudo()._claim_slot(self.business_id)
                 
-                    # Check container status first
-                check_cmd = ['docker', 'inspect', '--format', '{{.State.Status}}', f'{tenant_database.lower()}_odoo']
-                result = subprocess.run(check_cmd, capture_output=True, text=True)
-                if 'running' not in result.stdout:
-                    logger.error("Odoo container not running")
-                    if attempt < max_attempts - 1:
-                        time.sleep(delay_seconds)
-                    continue
+                try:
+                    with self._provisioning_stage("generating_identifiers"):
+                        # Generate the tenant admin password
+                        tenant_password = self._generate_tenant_password()
+                        self._validate_tenant_password(tenant_password)
+                        
+                        if pool_stack:
+                            tenant_database = pool_stack['tenant_database']
+                            tenant_id = pool_stack['tenant_id']
+                        else:
+                            # Generate tenant credentials using business ID
+                            tenant_id, tenant_database = self._generate_tenant_identifiers(self.business_id)
+                            
+                            logger.info(f"Generated tenant credentials - Business ID: {self.business_id}, DB: {tenant_database}")
+                            
+                            # Validate tenant configuration
+                            self._validate_tenant_names(tenant_database, tenant_id)
+                    
+                    if pool_stack:
+                        with self._provisioning_stage("claiming_pool_stack", tenant_database):
+                            if not self.env['naidash.tenant.pool']._recredential(tenant_database, tenant_id, tenant_password):
+                                raise ValidationError(_("Failed to renew the credentials of the tenant"))
+                except Exception:
+                    # The claim is committed already, nobody else would ever use or remove that stack
+                    if pool_stack:
+                        self.env['naidash.tenant.pool']._fail_claimed_slot(pool_stack['tenant_database'], pool_stack['tenant_id'])
+                    raise
                 
-                # 1. First verify/fix role
-                if not self._verify_and_fix_role(tenant_database, tenant_id, tenant_password):
-                    logger.error("Failed to verify/fix database role")
-                    if attempt < max_attempts - 1:
-                        time.sleep(delay_seconds)
-                    continue
+                # Pool stacks are built and verified already
+                next_step = 'verified' if pool_stack else 'identifiers'
                 
-                # 2. Test connection to postgres database
-                try:
-                    postgres_conn = psycopg2.connect(
-                        dbname='postgres',
-                        user='postgres',
-                        password='postgres',
-                        host='localhost',
-                        connect_timeout=10
-                    )
-                    postgres_conn.close()
-                    logger.info("Successfully connected to postgres database")
-                except Exception as e:
-                    logger.error(f"Failed to connect to postgres database: {str(e)}")
-                    if attempt < max_attempts - 1:
-                        time.sleep(delay_seconds)
-                    continue
-
-                # 3. Test Docker container connection with proper environment variables
-                docker_test_cmd = [
-                    'docker', 'exec',
-                    '-e', f'PGPASSWORD={tenant_password}',
-                    f'{tenant_database.lower()}_db',
-                    'psql',
-                    '-h', 'localhost',
-                    '-U', tenant_id.lower(),
-                    '-d', tenant_database.lower(),
-                    '-c', 'SELECT current_database(), current_user;'
-                ]
+                self._checkpoint_tenant_provisioning(next_step, {
+                    "partner_database_name": tenant_database,
+                    "partner_primary_id": tenant_id,
+                    "partner_secondary_id": tenant_password,
+                })
+            
+            tenant_database = self.partner_database_name
+            tenant_id = self.partner_primary_id
+            tenant_password = self.partner_secondary_id
+            
+            if self.tenant_provisioning_step == 'identifiers':
+                # The script can't pick up where it stopped, remove what an interrupted run left behind
+                if self.tenant_provisioning_attempts > 1:
+                    self._cleanup_failed_tenant(tenant_database, tenant_id)
                 
-                try:
-                    docker_result = subprocess.run(
-                        docker_test_cmd,
-                        capture_output=True,
-                        text=True,
-                        check=True
-                    )
-                    logger.info(f"Docker connection test output: {docker_result.stdout}")
-                    return True
-                except subprocess.CalledProcessError as e:
-                    logger.error(f"Docker connection test failed: {e.stderr}")
-                    if attempt < max_attempts - 1:
-                        time.sleep(delay_seconds)
-                    continue
-
-            except Exception as e:
-                logger.error(f"Unexpected error during connection test: {str(e)}")
-                if attempt < max_attempts - 1:
-                    time.sleep(delay_seconds)
-                continue
-        
-        logger.error(f"Connection test failed after {max_attempts} attempts")
-        return False
-
-    def _get_postgres_connection(self):
-        """Get connection to postgres database"""
-        try:
-            # Use environment variables for credentials if available
-            pg_password = os.environ.get('PGPASSWORD', 'postgres')
+                tenant_creation_result = self._build_tenant_stack(tenant_database, tenant_id, tenant_password, verify=False)
+                
+                if not tenant_creation_result["success"]:
+                    logger.error(f"Tenant creation failed: {tenant_creation_result['message']}")
+                    raise ValidationError(tenant_creation_result["message"])
+                
+                self._checkpoint_tenant_provisioning('stack_created')
             
-            try:
-                # First try with postgres user
-                return psycopg2.connect(
-                    dbname='postgres',
-                    user='postgres',
-                    password=pg_password,
-                    host='localhost'
-                )
-            except psycopg2.OperationalError as e:
-                logger.warning(f"Failed to connect as postgres user: {str(e)}")
-                # Try with current system user
-                return psycopg2.connect(
-                    dbname='postgres',
-                    user=os.getenv('USER'),
-                    password=pg_password,
-                    host='localhost'
-                )
-        except psycopg2.OperationalError as e:
-            logger.error(f"Failed to connect to PostgreSQL: {str(e)}")
-            raise
-
+            if self.tenant_provisioning_step == 'stack_created':
+                # Wait for the containers to come up instead of sleeping a fixed time
+                with self._provisioning_stage("stabilizing", tenant_database) as stage:
+                    stage['success'] = self._wait_for_tenant_ready(tenant_database)
+                
+                if not stage['success']:
+                    raise ValidationError(_("Tenant did not become ready"))
+                
+                self._checkpoint_tenant_provisioning('stack_ready')
+            
+            if self.tenant_provisioning_step == 'stack_ready':
+                with self._provisioning_stage("verifying", tenant_database) as stage:
+                    stage['success'] = self._verify_tenant_creation(tenant_database, tenant_id, tenant_password)
+                
+                if not stage['success']:
+                    raise ValidationError(_("Tenant verification failed"))
+                
+                self._checkpoint_tenant_provisioning('verified')
+            
+            if self.tenant_provisioning_step == 'verified':
+                # The company becomes routable once its tenant is usable
+                self.env['naidash.tenant.port']._assign(tenant_database, self.business_id, self.id)
+                self._checkpoint_tenant_provisioning('done', {'active': True})
+                logger.info(f"Tenant created successfully: {tenant_database}")
+        except Exception as e:
+            logger.error(f"Tenant provisioning of {self.business_id} failed at step {self.tenant_provisioning_step}: {str(e)}")
+            self.env.cr.rollback()
+            self.tenant_provisioning_error = str(e)
+            self.env.cr.commit()
+            raise ValidationError(_("Failed to create tenant environment")) from e
+    
     # === Main partner creation method ===
     def create_the_partner(self, request_data):
-        """Create a partner with tenant setup for companies"""
-        request.httprequest.environ['REQUEST_TIMEOUT'] = 900  # 15 minutes
+        """Create a partner with tenant setup for companies.
+        Company signups coming from the API run this from a provisioning job, see naidash.tenant.job.
+        Companies are created inactive and their tenant is provisioned step by step, see `_provision_tenant`.
+        A signup repeated after a failure resumes the provisioning of the earlier one
+        """
+        if request:
+            request.httprequest.environ['REQUEST_TIMEOUT'] = 900  # 15 minutes
         try:
             # Initialize response containers
             data = dict()
             response_data = dict()
-            tenant_database = None
-            tenant_id = None
-            tenant_password = None
-            business_id = None  # Initialize business_id
             
             # Validate request data first
             validation_result = self._validate_partner_data(request_data)
             if validation_result.get("error"):
                 return validation_result
-                
-            # Check for existing partner before proceeding
-            if self._check_existing_partner(request_data):
-                return {
-                    "code": 409,
-                    "message": "Account already exists!"
-                }
             
-            # Prepare partner details first
-            partner_details = self._prepare_partner_details(request_data)
+            is_company = request_data.get("account_type") == "company"
+            partner = self._find_unfinished_company(request_data) if is_company else self.browse()
+            
+            if partner:
+                # Only the user who started a signup may resume it, the result carries the tenant credentials
+                if partner.create_uid != self.env.user:
+                    return {
+                        "code": 409,
+                        "message": "Account already exists!"
+                    }
                 
-            # For company accounts, create tenant first
-            if request_data.get("account_type") == "company":
-                try:
-                    # Generate business ID from company name
-                    business_id = self._generate_business_id(request_data.get("name"))
-                    
-                    # Add business_id to partner details
-                    partner_details["business_id"] = business_id
-                    
-                    # Generate tenant credentials using business ID
-                    tenant_id, tenant_database = self._generate_tenant_identifiers(business_id)
-                    tenant_password = self._generate_tenant_password()
-                    
-                    logger.info(f"Generated tenant credentials - Business ID: {business_id}, DB: {tenant_database}")
-                    
-                    # Validate tenant configuration
-                    self._validate_tenant_names(tenant_database, tenant_id)
-                    self._validate_tenant_password(tenant_password)
-                    
-                    # Get and validate script
-                    script_path = self._get_script_path()
-                    self._validate_script_permissions(script_path)
-                    
-                    # Create tenant with timeout
-                    tenant_creation_result = self._create_tenant_with_timeout(
-                        script_path,
-                        tenant_database,
-                        tenant_id,
-                        tenant_password,
-                        timeout=900  # 15 minutes
-                    )
-                    
-                    if not tenant_creation_result["success"]:
-                        logger.error(f"Tenant creation failed: {tenant_creation_result['message']}")
-                        raise ValidationError(tenant_creation_result["message"])
-                        
-                    logger.info(f"Tenant created successfully: {tenant_database}")
-                    
-                    # Add tenant info to partner details
+                logger.info(f"Resuming the tenant provisioning of {partner.business_id} after step {partner.tenant_provisioning_step}")
+            else:
+                # Check for existing partner before proceeding
+                if self._check_existing_partner(request_data):
+                    return {
+                        "code": 409,
+                        "message": "Account already exists!"
+                    }
+                
+                # Prepare partner details first
+                partner_details = self._prepare_partner_details(request_data)
+                
+                if is_company:
                     partner_details.update({
-                        "partner_database_name": tenant_database,
-                        "partner_primary_id": tenant_id,
-                        "partner_secondary_id": tenant_password,
+                        "active": False,
+                        "tenant_provisioning_step": "pending",
                     })
-                        
-                except Exception as e:
-                    logger.error(f"Failed to create tenant: {str(e)}")
-                    # Clean up any partial tenant creation
-                    if tenant_database and tenant_id:
-                        logger.info(f"Cleaning up failed tenant: {tenant_database}")
-                        self._cleanup_failed_tenant(tenant_database, tenant_id)
-                    raise ValidationError(_("Failed to create tenant environment")) from e
-                    
-            # Create partner within a transaction
-            with self.env.cr.savepoint():
-                partner = self.env['res.partner'].create(partner_details)
                 
-                # Prepare success response
-                data['id'] = partner.id
-                if partner.company_type == "company":
-                    data.update({
-                        'tenant_database': partner.partner_database_name,
-                        'tenant_id': partner.partner_primary_id,
-                        'tenant_password': partner.partner_secondary_id,
-                        'business_id': partner.business_id,
-                    })
-                    
-                response_data["code"] = 201
-                response_data["message"] = "Partner created successfully"
-                response_data["data"] = data
+                # Create partner within a transaction
+                with self._provisioning_stage("creating_partner"):
+                    for attempt in range(BUSINESS_ID_ALLOCATION_ATTEMPTS):
+                        if is_company:
+                            # Generate business ID from company name
+                            partner_details["business_id"] = self._generate_business_id(request_data.get("name"))
+                        
+                        try:
+                            with self.env.cr.savepoint():
+                                partner = self.env['res.partner'].create(partner_details)
+                            break
+                        except psycopg2.errors.UniqueViolation:
+                            # A concurrent signup took the same business ID
+                            if not is_company or attempt == BUSINESS_ID_ALLOCATION_ATTEMPTS - 1:
+                                raise
+                            logger.warning(f"Business ID {partner_details['business_id']} was taken concurrently, allocating another one")
                 
                 logger.info(f"Partner created successfully: ID {partner.id}")
+            
+            if is_company:
+                with partner._tenant_provisioning_lock() as locked:
+                    if not locked:
+                        return {
+                            "code": 409,
+                            "message": "This account is already being set up"
+                        }
+                    partner._provision_tenant()
                 
+                self.env['naidash.tenant.stage.timing']._link_partner(
+                    partner.id, partner.partner_database_name, job_id=self.env.context.get('tenant_job_id')
+                )
+            
+            # Prepare success response
+            data['id'] = partner.id
+            if partner.company_type == "company":
+                data.update({
+                    'tenant_database': partner.partner_database_name,
+                    'tenant_id': partner.partner_primary_id,
+                    'tenant_password': partner.partner_secondary_id,
+                    'business_id': partner.business_id,
+                })
+            
+            response_data["code"] = 201
+            response_data["message"] = "Partner created successfully"
+            response_data["data"] = data
+            
             return response_data
             
         except ValidationError as e:
             logger.error(f"Validation error in create_the_partner: {str(e)}")
-            # Make sure to clean up in case of validation error
-            if tenant_database and tenant_id:
-                self._cleanup_failed_tenant(tenant_database, tenant_id)
             raise
             
         except Exception as e:
             logger.error(f"Error in create_the_partner: {str(e)}")
-            # Ensure cleanup in case of any error
-            if tenant_database and tenant_id:
-                self._cleanup_failed_tenant(tenant_database, tenant_id)
             raise
         
         
@@ -778,7 +1252,7 @@ class NaidashPartner(models.Model):
             """Look up tenant details by business ID"""
             partner = self.env['res.partner'].search([
                 ('business_id', '=', business_id),
-                ('company_type', '=', 'company')
+                ('is_company', '=', True)
             ], limit=1)
             
             if partner:
@@ -792,18 +1266,25 @@ class NaidashPartner(models.Model):
         
         #validation to ensure business IDs are unique
     def _validate_business_id(self, business_id):
-        """Validate that business ID is unique"""
-        existing = self.env['res.partner'].search_count([
-            ('business_id', '=', business_id)
-        ])
-        
-        if existing > 0:
-            # If duplicate found, add random suffix
-            suffix = "".join(random.choices(string.digits, k=4))
-            new_business_id = f"{business_id}_{suffix}"
-            return self._validate_business_id(new_business_id)
+        """Return `business_id` or, when it is taken, the first free `<business_id>_<4 digits>` variant.
+        Candidates are checked a batch at a time, archived companies included. The unique constraint
+        on business_id catches concurrent signups that pick the same candidate
+        """
+        candidates = [business_id]
         
-        return business_id
+        while True:
+            candidates += [
+                f"{business_id}_{''.join(random.choices(string.digits, k=4))}"
+                for _candidate in range(BUSINESS_ID_BATCH_SIZE)
+            ]
+            self.env.cr.execute("SELECT business_id FROM res_partner WHERE business_id = ANY(%s)", (candidates,))
+            taken = {row[0] for row in self.env.cr.fetchall()}
+            
+            for candidate in candidates:
+                if candidate not in taken:
+                    return candidate
+            
+            candidates = []
 
     def _generate_tenant_password(self):
         """Generate a valid tenant password that meets all requirements"""
@@ -821,17 +1302,14 @@ class NaidashPartner(models.Model):
     # API to lookup tenat details by business ID
     def lookup_tenant_details(self, business_id):
         """Look up tenant connection details by business ID"""
-        partner = self.env['res.partner'].search([
-            ('business_id', '=', business_id),
-            ('company_type', '=', 'company')
-        ], limit=1)
+        tenant_route = self._get_tenant_route(business_id)
         
-        if partner:
+        if tenant_route:
             return {
                 'code': 200,
                 'data': {
-                    'tenant_database': partner.partner_database_name,
-                    'tenant_id': partner.partner_primary_id,
+                    'tenant_database': tenant_route.database,
+                    'tenant_id': tenant_route.primary_id,
                     'tenant_url': f'/api/tenant/{business_id}'
                 }
             }
@@ -11,6 +11,14 @@ logger = logging.getLogger(__name__)
 class NaidashPartnerCategory(models.Model):
     _inherit = "res.partner.category"
     
+    def write(self, vals):
+        res = super(NaidashPartnerCategory, self).write(vals)
+        
+        # The cached login roles depend on the tag names and members
+        if 'name' in vals or 'partner_ids' in vals:
+            self.env.registry.clear_cache()
+            
+        return res
         
     def create_the_partner_category(self, request_data):
         """Create a partner category
@@ -0,0 +1,42 @@
+import threading
+
+from collections import deque
+
+
+class OutputTail:
+    """Drains a process's text stream on a daemon thread.
+
+    Every line is handed to `forward` (typically a logger call) as soon as it is read,
+    only the last `max_lines` lines are kept and lines are cut at `max_line_length`
+    characters, so a noisy script cannot grow the worker's memory.
+    """
+
+    def __init__(self, stream, forward, max_lines=200, max_line_length=4096):
+        self.stream = stream
+        self.forward = forward
+        self.max_line_length = max_line_length
+        self.lines = deque(maxlen=max_lines)
+        self.line_count = 0
+        self._thread = threading.Thread(target=self._drain, daemon=True, name='naidash_output_tail')
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _drain(self):
+        try:
+            for line in iter(lambda: self.stream.readline(self.max_line_length), ''):
+                line = line.rstrip('\n')
+                self.lines.append(line)
+                self.line_count += 1
+                self.forward(line)
+        except (OSError, ValueError):
+            # The stream was closed under us, the process is gone
+            pass
+
+    def join(self, timeout=None):
+        """Wait for the stream to reach EOF. Processes left behind by the script may keep it open, hence the timeout"""
+        self._thread.join(timeout)
+
+    def text(self):
+        return "\n".join(self.lines)
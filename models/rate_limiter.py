@@ -0,0 +1,175 @@
+import fcntl
+import hashlib
+import logging
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+from odoo import tools
+
+logger = logging.getLogger(__name__)
+
+# Limits as "<requests>/<seconds>", overridable with the `naidash_auth.rate_limit.<scope>` system parameters.
+# Behind the nginx reverse proxy the `ip` scope needs Odoo's `proxy_mode`, otherwise every caller has the proxy's address
+DEFAULT_RATE_LIMITS = {
+    'ip': '60/60',
+    'login': '10/300',
+    'business_id': '120/60',
+}
+
+# How often, in seconds, the limits are re-read from the system parameters
+RATE_LIMITS_REFRESH_INTERVAL = 60
+
+# A bucket slot: key hash, tokens left, last refill timestamp
+SLOT = struct.Struct('<Qdd')
+
+
+class SharedRateLimiter:
+    """Token buckets kept in a memory-mapped file so that every Odoo worker on the host shares them.
+
+    Buckets live in a fixed-size open-addressing table, when a key's probe window is
+    full the stalest bucket is recycled. A full bucket holds `capacity` tokens and
+    refills at `capacity / period` tokens per second.
+    """
+
+    def __init__(self, path=None, slots=8192, probes=8):
+        self.path = path or os.path.join(tempfile.gettempdir(), 'naidash_auth_rate_limits.bin')
+        self.slots = slots
+        self.probes = probes
+        self._pid = None
+        self._file = None
+        self._map = None
+        self._lock = threading.Lock()
+
+    def _mapping(self):
+        """Map the bucket file, again after a fork since flock() locks are shared by forked processes"""
+        if self._pid != os.getpid():
+            size = self.slots * SLOT.size
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+
+            self._file = os.fdopen(fd, 'r+b')
+            self._map = mmap.mmap(fd, size)
+            self._pid = os.getpid()
+
+        return self._map
+
+    def consume(self, key, capacity, period):
+        """Take one token from the bucket of `key`.
+        Returns (allowed, retry_after) where retry_after is in seconds
+        """
+        if not (0 < capacity < math.inf and 0 < period < math.inf):
+            raise ValueError(f"Invalid token bucket {capacity}/{period}, both must be positive")
+
+        key_hash = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') or 1
+        refill_rate = capacity / period
+        start = key_hash % self.slots
+
+        with self._lock:
+            mapping = self._mapping()
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+
+            try:
+                now = time.time()
+                offset = None
+                tokens, updated = capacity, now
+                stalest = None
+
+                for probe in range(self.probes):
+                    slot_offset = ((start + probe) % self.slots) * SLOT.size
+                    slot_hash, slot_tokens, slot_updated = SLOT.unpack_from(mapping, slot_offset)
+
+                    if slot_hash == key_hash:
+                        offset = slot_offset
+                        tokens, updated = slot_tokens, slot_updated
+                        break
+
+                    if stalest is None or slot_hash == 0 or slot_updated < stalest[1]:
+                        stalest = (slot_offset, 0 if slot_hash == 0 else slot_updated)
+
+                if offset is None:
+                    offset = stalest[0]
+
+                tokens = min(capacity, tokens + (now - updated) * refill_rate)
+                allowed = tokens >= 1
+
+                if allowed:
+                    tokens -= 1
+
+                SLOT.pack_into(mapping, offset, key_hash, tokens, now)
+            finally:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+
+        return allowed, 0 if allowed else (1 - tokens) / refill_rate
+
+
+class AuthRateLimits:
+    """Applies the per-scope limits of the public auth endpoints"""
+
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self._limits = None
+        self._enabled = True
+        self._loaded_at = 0
+        self._proxy_mode_checked = False
+
+    def _parse_limit(self, scope, raw_limit):
+        try:
+            capacity, period = (float(value) for value in raw_limit.split('/'))
+            if not (0 < capacity < math.inf and 0 < period < math.inf):
+                raise ValueError("the requests and the period must be positive")
+            return capacity, period
+        except (AttributeError, ValueError):
+            logger.error(f"Invalid rate limit `{raw_limit}` for {scope}, using {DEFAULT_RATE_LIMITS[scope]}")
+            return self._parse_limit(scope, DEFAULT_RATE_LIMITS[scope])
+
+    def _load(self, env):
+        """Refresh the limits from the system parameters, at most once per refresh interval"""
+        if self._limits is not None and time.monotonic() - self._loaded_at < RATE_LIMITS_REFRESH_INTERVAL:
+            return
+
+        if not self._proxy_mode_checked and not tools.config['proxy_mode']:
+            logger.warning("proxy_mode is off, behind a reverse proxy every caller shares the proxy's IP rate limit")
+        self._proxy_mode_checked = True
+
+        config = env['ir.config_parameter'].sudo()
+        self._enabled = config.get_param('naidash_auth.rate_limit_enabled', 'True') not in ('False', 'false', '0')
+        self._limits = {
+            scope: self._parse_limit(scope, config.get_param(f'naidash_auth.rate_limit.{scope}', default))
+            for scope, default in DEFAULT_RATE_LIMITS.items()
+        }
+        self._loaded_at = time.monotonic()
+
+    def check(self, env, endpoint, **keys):
+        """Consume a token for every given scope (ip, login, business_id) of an endpoint.
+        Buckets are per database, the bucket file is shared by every database of the host.
+        Returns None when the call is allowed, otherwise the seconds to wait before retrying
+        """
+        self._load(env)
+
+        if not self._enabled:
+            return None
+
+        retry_after = None
+        for scope, value in keys.items():
+            if not value:
+                continue
+
+            capacity, period = self._limits[scope]
+            allowed, wait = self.limiter.consume(f"{env.cr.dbname}:{endpoint}:{scope}:{str(value).lower()}", capacity, period)
+
+            if not allowed:
+                logger.warning(f"Rate limit exceeded on {endpoint} for {scope} {value}")
+                retry_after = max(retry_after or 0, wait)
+
+        return retry_after
+
+
+# Shared by every worker of the host through the bucket file
+auth_rate_limits = AuthRateLimits(SharedRateLimiter())
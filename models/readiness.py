@@ -0,0 +1,76 @@
+import logging
+import random
+import time
+
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+ProbeResult = namedtuple('ProbeResult', ['name', 'ready', 'attempts', 'duration', 'error'])
+
+
+def backoff_delays(initial_delay=0.5, max_delay=10.0, factor=2.0):
+    """Yield exponentially growing delays with full jitter, capped at `max_delay`"""
+    ceiling = initial_delay
+
+    while True:
+        yield random.uniform(0, ceiling)
+        ceiling = min(ceiling * factor, max_delay)
+
+
+class ReadinessProbe:
+    """Polls readiness checks until they pass or a shared deadline is reached.
+
+    A check is a callable returning a truthy value once the resource is ready, it may
+    raise while the resource is still starting. Checks are retried with exponential
+    backoff and jitter so that a tenant is reported ready as soon as it actually is.
+    """
+
+    def __init__(self, timeout=300, initial_delay=0.5, max_delay=10.0, factor=2.0):
+        self.timeout = timeout
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.factor = factor
+
+    def wait_for(self, name, check, deadline):
+        """Run `check` until it passes or `deadline` (a time.monotonic() value) is reached"""
+        started_at = time.monotonic()
+        attempts = 0
+        error = None
+        delays = backoff_delays(self.initial_delay, self.max_delay, self.factor)
+
+        while True:
+            attempts += 1
+
+            try:
+                if check():
+                    duration = time.monotonic() - started_at
+                    logger.info(f"✓ {name} ready after {duration:.2f}s ({attempts} attempt(s))")
+                    return ProbeResult(name, True, attempts, duration, None)
+                error = None
+            except Exception as e:
+                error = str(e)
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                duration = time.monotonic() - started_at
+                logger.error(f"{name} not ready after {duration:.2f}s ({attempts} attempt(s)): {error or 'check failed'}")
+                return ProbeResult(name, False, attempts, duration, error)
+
+            time.sleep(min(next(delays), remaining))
+
+    def run(self, probes):
+        """Run the (name, check) probes in order against a single deadline.
+        Stops at the first probe that is not ready, returns the list of ProbeResult
+        """
+        deadline = time.monotonic() + self.timeout
+        results = []
+
+        for name, check in probes:
+            result = self.wait_for(name, check, deadline)
+            results.append(result)
+
+            if not result.ready:
+                break
+
+        return results
@@ -0,0 +1,55 @@
+import json
+import logging
+
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# Roles by decreasing priority, each with the group/tag names (lowercase) that grant it
+DEFAULT_ROLE_PRIORITY = (
+    ("Admin", ("admin", "administrator")),
+    ("Client", ("client",)),
+    ("Dispatcher", ("dispatcher",)),
+    ("Rider", ("rider",)),
+)
+ADMIN_ROLE = "Admin"
+DEFAULT_ROLE = "User"
+
+
+@lru_cache(maxsize=16)
+def parse_role_priority(raw_priority):
+    """Parse a JSON priority table such as `[["Admin", ["admin", "administrator"]], ["Client", ["client"]]]`.
+    Falls back to the default table when it's empty or invalid
+    """
+    if not raw_priority:
+        return DEFAULT_ROLE_PRIORITY
+
+    try:
+        return tuple(
+            (str(role), tuple(str(name).lower() for name in names))
+            for role, names in json.loads(raw_priority)
+        )
+    except (ValueError, TypeError) as e:
+        logger.error(f"Invalid role priority table, using the default one: {str(e)}")
+        return DEFAULT_ROLE_PRIORITY
+
+
+class RoleResolver:
+    """Resolves the primary role of a user from their group and partner tag names.
+
+    The role listed first in the priority table wins.
+    """
+
+    def resolve(self, role_names, is_admin=False, priority=DEFAULT_ROLE_PRIORITY):
+        """Return the primary role granted by `role_names`"""
+        names = {name.lower() for name in role_names if isinstance(name, str)}
+
+        for role, role_aliases in priority:
+            if names.intersection(role_aliases):
+                return role
+
+        return ADMIN_ROLE if is_admin else DEFAULT_ROLE
+
+
+# Shared by every request handled in this worker process
+role_resolver = RoleResolver()
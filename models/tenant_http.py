@@ -0,0 +1,134 @@
+import logging
+import threading
+import time
+import requests
+
+from collections import OrderedDict
+from http.cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class TenantHttpPool:
+    """Keeps one persistent, keep-alive HTTP session per tenant container port.
+
+    Sessions are shared by every request handled in the worker process, the
+    number of ports tracked is bounded (least recently used ports are dropped
+    first) and sessions left idle for longer than `idle_timeout` are closed.
+    """
+
+    def __init__(self, host="localhost", max_sessions=64, pool_maxsize=8, idle_timeout=300):
+        self.host = host
+        self.max_sessions = max_sessions
+        self.pool_maxsize = pool_maxsize
+        self.idle_timeout = idle_timeout
+        self._sessions = OrderedDict()
+        self._stats = dict()
+        self._lock = threading.Lock()
+
+    def _new_session(self):
+        """Create a session whose cookie jar never keeps tenant cookies"""
+        session = requests.Session()
+
+        # Tenant session cookies must never leak from one login to the next,
+        # callers pass them explicitly and read them from the response instead
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        session.headers.update({'Content-Type': 'application/json'})
+
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize)
+        session.mount('http://', adapter)
+        return session
+
+    def _evict(self, port, reason):
+        """Close and forget the session of a port. The lock must be held"""
+        session = self._sessions.pop(port, None)
+
+        if session is not None:
+            session.close()
+            self._stats[port]["evictions"] += 1
+            logger.info(f"Closed tenant HTTP session for port {port} ({reason})")
+
+    def evict_idle(self):
+        """Close the sessions that have not been used within the idle timeout"""
+        now = time.monotonic()
+
+        with self._lock:
+            for port in list(self._sessions):
+                if now - self._stats[port]["last_used"] > self.idle_timeout:
+                    self._evict(port, "idle")
+
+    def session(self, port):
+        """Return the shared session of a tenant port, creating it if needed"""
+        port = int(port)
+        self.evict_idle()
+
+        with self._lock:
+            stats = self._stats.setdefault(port, {
+                "created": 0,
+                "requests": 0,
+                "errors": 0,
+                "evictions": 0,
+                "last_used": time.monotonic()
+            })
+            session = self._sessions.get(port)
+
+            if session is None:
+                while len(self._sessions) >= self.max_sessions:
+                    oldest_port = next(iter(self._sessions))
+                    self._evict(oldest_port, "pool full")
+
+                session = self._new_session()
+                self._sessions[port] = session
+                stats["created"] += 1
+            else:
+                self._sessions.move_to_end(port)
+
+            stats["last_used"] = time.monotonic()
+            return session
+
+    def post(self, port, path, **kwargs):
+        """POST to a tenant container through its pooled session"""
+        port = int(port)
+        session = self.session(port)
+        url = f"http://{self.host}:{port}{path}"
+
+        try:
+            response = session.post(url, **kwargs)
+            self._record(port, "requests")
+            return response
+        except requests.RequestException:
+            self._record(port, "errors")
+            raise
+
+    def _record(self, port, counter):
+        with self._lock:
+            if port in self._stats:
+                self._stats[port][counter] += 1
+
+    def stats(self):
+        """Return a snapshot of the per-port pool statistics"""
+        now = time.monotonic()
+
+        with self._lock:
+            return {
+                port: {
+                    "open": port in self._sessions,
+                    "created": stats["created"],
+                    "requests": stats["requests"],
+                    "errors": stats["errors"],
+                    "evictions": stats["evictions"],
+                    "idle_seconds": round(now - stats["last_used"], 1)
+                }
+                for port, stats in self._stats.items()
+            }
+
+    def close(self):
+        """Close every pooled session"""
+        with self._lock:
+            for port in list(self._sessions):
+                self._evict(port, "closed")
+
+
+# Shared by every request handled in this worker process
+tenant_http_pool = TenantHttpPool()
@@ -0,0 +1,221 @@
+import json
+import logging
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import timedelta
+from odoo import models, fields, api, _, SUPERUSER_ID
+from odoo.exceptions import AccessDenied, AccessError
+
+logger = logging.getLogger(__name__)
+
+
+class NaidashTenantJob(models.Model):
+    _name = "naidash.tenant.job"
+    _description = "Tenant Provisioning Job"
+    _order = "id desc"
+
+    state = fields.Selection(
+        [
+            ('queued', 'Queued'),
+            ('running', 'Running'),
+            ('done', 'Done'),
+            ('failed', 'Failed')
+        ],
+        string="Status",
+        default='queued',
+        required=True,
+        index=True
+    )
+    stage = fields.Char(string="Current Stage", default="queued")
+    request_data = fields.Text(string="Request Data", required=True)
+    result = fields.Text(string="Result")
+    error_message = fields.Text(string="Error Message")
+    partner_id = fields.Many2one('res.partner', string="Partner", ondelete='set null')
+    started_at = fields.Datetime(string="Started At")
+    finished_at = fields.Datetime(string="Finished At")
+
+    def _get_provisioning_limits(self):
+        """Return the (max parallel provisions, max pending jobs) system parameters"""
+        config = self.env['ir.config_parameter'].sudo()
+        max_parallel = int(config.get_param('naidash_auth.provisioning_max_parallel', 2))
+        max_pending = int(config.get_param('naidash_auth.provisioning_max_pending', 20))
+        return max(max_parallel, 1), max(max_pending, 1)
+
+    @api.model
+    def submit(self, request_data):
+        """Queue the creation of a company partner and its tenant, returns 202 with the job ID"""
+        try:
+            partner_model = self.env['res.partner']
+
+            # Reject what would fail anyway before queueing it
+            validation_result = partner_model._validate_partner_data(request_data)
+            if validation_result.get("error"):
+                return validation_result
+
+            if partner_model._check_existing_partner(request_data):
+                return {
+                    "code": 409,
+                    "message": "Account already exists!"
+                }
+
+            # Admission control
+            max_pending = self._get_provisioning_limits()[1]
+            pending_jobs = self.sudo().search_count([('state', 'in', ('queued', 'running'))])
+
+            if pending_jobs >= max_pending:
+                logger.warning(f"Rejected tenant provisioning request: {pending_jobs} job(s) pending")
+                return {
+                    "code": 503,
+                    "message": "Too many accounts are being set up, please try again in a few minutes"
+                }
+
+            job = self.sudo().create({'request_data': json.dumps(request_data)})
+            self.env.ref('naidash_auth.ir_cron_run_tenant_jobs').sudo()._trigger()
+            logger.info(f"Queued tenant provisioning job {job.id}")
+
+            return {
+                "code": 202,
+                "message": "Account setup has started",
+                "data": {"job_id": job.id}
+            }
+        except AccessDenied as e:
+            logger.error(f"AccessDenied error ocurred while queueing the tenant provisioning job:\n\n{str(e)}")
+            raise e
+        except AccessError as e:
+            logger.error(f"AccessError ocurred while queueing the tenant provisioning job:\n\n{str(e)}")
+            raise e
+        except Exception as e:
+            logger.error(f"An error ocurred while queueing the tenant provisioning job:\n\n{str(e)}")
+            raise e
+
+    @api.model
+    def get_the_job(self, job_id):
+        """Get the status of a provisioning job submitted by the current user"""
+        try:
+            data = dict()
+            response_data = dict()
+
+            job = self.sudo().search([('id', '=', int(job_id))])
+
+            if not job or (job.create_uid != self.env.user and not self.env.user._is_system()):
+                response_data["code"] = 404
+                response_data["message"] = "Job not found!"
+                return response_data
+
+            data["id"] = job.id
+            data["state"] = job.state
+            data["stage"] = job.stage or ""
+            data["created_at"] = job.create_date.strftime('%Y-%m-%d %H:%M:%S')
+            data["started_at"] = job.started_at.strftime('%Y-%m-%d %H:%M:%S') if job.started_at else None
+            data["finished_at"] = job.finished_at.strftime('%Y-%m-%d %H:%M:%S') if job.finished_at else None
+            data["result"] = json.loads(job.result) if job.result else None
+            data["error"] = job.error_message or None
+
+            response_data["code"] = 200
+            response_data["message"] = "Success"
+            response_data["data"] = data
+
+            return response_data
+        except AccessDenied as e:
+            logger.error(f"AccessDenied error ocurred while fetching the provisioning job:\n\n{str(e)}")
+            raise e
+        except AccessError as e:
+            logger.error(f"AccessError ocurred while fetching the provisioning job:\n\n{str(e)}")
+            raise e
+        except Exception as e:
+            logger.error(f"The following error ocurred while fetching the provisioning job:\n\n{str(e)}")
+            raise e
+
+    def _report_stage(self, stage):
+        """Record the stage of a job on its own cursor so that status requests see it right away"""
+        with self.env.registry.cursor() as cr:
+            cr.execute("UPDATE naidash_tenant_job SET stage = %s WHERE id = %s", (stage, self.id))
+
+    @api.model
+    def _claim_next_job(self):
+        """Atomically move the oldest queued job to running, concurrent runners skip locked rows"""
+        self.env.cr.execute("""
+            UPDATE naidash_tenant_job
+               SET state = 'running', stage = 'starting', started_at = (now() at time zone 'UTC')
+             WHERE id = (
+                SELECT id FROM naidash_tenant_job
+                 WHERE state = 'queued'
+                 ORDER BY id
+                 LIMIT 1
+                   FOR UPDATE SKIP LOCKED
+             )
+            RETURNING id
+        """)
+        row = self.env.cr.fetchone()
+        self.env.cr.commit()
+        return row[0] if row else None
+
+    def _run_job(self, job_id):
+        """Provision one job on a dedicated cursor, called from the runner threads"""
+        with self.env.registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            job = env['naidash.tenant.job'].browse(job_id)
+            request_data = json.loads(job.request_data)
+
+            try:
+                partner_model = env['res.partner'].with_user(job.create_uid).with_context(tenant_job_id=job.id)
+                response_data = partner_model.create_the_partner(request_data)
+                partner_id = (response_data.get("data") or {}).get("id")
+
+                job.write({
+                    'state': 'done' if partner_id else 'failed',
+                    'stage': 'done' if partner_id else 'failed',
+                    'result': json.dumps(response_data),
+                    'partner_id': partner_id or False,
+                    'finished_at': fields.Datetime.now()
+                })
+                logger.info(f"Tenant provisioning job {job.id} finished: {response_data.get('message')}")
+            except Exception as e:
+                cr.rollback()
+                logger.exception(f"Tenant provisioning job {job_id} failed: {str(e)}")
+                job.write({
+                    'state': 'failed',
+                    'stage': 'failed',
+                    'error_message': str(e),
+                    'finished_at': fields.Datetime.now()
+                })
+
+    @api.model
+    def _fail_stale_jobs(self, max_runtime_minutes=60):
+        """Fail the jobs left running by a runner that died"""
+        stale_jobs = self.sudo().search([
+            ('state', '=', 'running'),
+            ('started_at', '<', fields.Datetime.now() - timedelta(minutes=max_runtime_minutes))
+        ])
+
+        if stale_jobs:
+            logger.warning(f"Failing {len(stale_jobs)} stale tenant provisioning job(s)")
+            stale_jobs.write({
+                'state': 'failed',
+                'stage': 'failed',
+                'error_message': _("The provisioning was interrupted"),
+                'finished_at': fields.Datetime.now()
+            })
+            self.env.cr.commit()
+
+    @api.model
+    def _cron_run_jobs(self):
+        """Run the queued jobs, at most `naidash_auth.provisioning_max_parallel` at a time.
+        Free slots are refilled as soon as a provision finishes, until the queue is empty
+        """
+        self._fail_stale_jobs()
+        max_parallel = self._get_provisioning_limits()[0]
+        running = set()
+
+        with ThreadPoolExecutor(max_workers=max_parallel, thread_name_prefix='naidash_tenant_job') as executor:
+            while True:
+                while len(running) < max_parallel:
+                    job_id = self._claim_next_job()
+                    if not job_id:
+                        break
+                    running.add(executor.submit(self._run_job, job_id))
+
+                if not running:
+                    break
+
+                done, running = wait(running, return_when=FIRST_COMPLETED)
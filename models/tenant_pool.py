@@ -0,0 +1,174 @@
+import logging
+import random
+import string
+
+from datetime import timedelta
+from odoo import models, fields, api, SUPERUSER_ID
+
+from .docker_client import docker_client, DockerError
+
+logger = logging.getLogger(__name__)
+
+# Values reach psql as variables through the environment, :'name' quotes them as SQL literals
+RECREDENTIAL_SCRIPT = """psql -X -q -v ON_ERROR_STOP=1 -U postgres -d "$TENANT_DATABASE" -v login="$TENANT_LOGIN" -v password="$TENANT_PASSWORD" <<'SQL'
+UPDATE res_users SET password = :'password' WHERE login = :'login';
+SQL
+"""
+
+
+class NaidashTenantPool(models.Model):
+    _name = "naidash.tenant.pool"
+    _description = "Pre-provisioned Tenant Stack"
+    _order = "id asc"
+
+    state = fields.Selection(
+        [
+            ('provisioning', 'Provisioning'),
+            ('ready', 'Ready'),
+            ('claimed', 'Claimed'),
+            ('failed', 'Failed')
+        ],
+        string="Status",
+        default='provisioning',
+        required=True,
+        index=True
+    )
+    tenant_database = fields.Char(string="Tenant Database", required=True)
+    tenant_id = fields.Char(string="Tenant ID", required=True)
+    db_password = fields.Char(string="Database Password", required=True, groups='base.group_system')
+    business_id = fields.Char(string="Claimed By Business ID")
+    claimed_at = fields.Datetime(string="Claimed At")
+
+    _sql_constraints = [
+        ('tenant_database_unique', 'unique(tenant_database)', 'The tenant database of a pool stack must be unique'),
+    ]
+
+    @api.model
+    def _get_pool_size(self):
+        """Number of ready stacks to keep, from the `naidash_auth.tenant_pool_size` system parameter (0 disables the pool)"""
+        return int(self.env['ir.config_parameter'].sudo().get_param('naidash_auth.tenant_pool_size', 0))
+
+    @api.model
+    def _claim_slot(self, business_id):
+        """Atomically hand the oldest ready stack over to a business.
+        The claim is committed on its own cursor so that no other signup can get the same stack.
+        Returns a dict with the stack's tenant_database, tenant_id and db_password, or None
+        """
+        with self.env.registry.cursor() as cr:
+            cr.execute("""
+                UPDATE naidash_tenant_pool
+                   SET state = 'claimed', business_id = %s, claimed_at = (now() at time zone 'UTC')
+                 WHERE id = (
+                    SELECT id FROM naidash_tenant_pool
+                     WHERE state = 'ready'
+                     ORDER BY id
+                     LIMIT 1
+                       FOR UPDATE SKIP LOCKED
+                 )
+                RETURNING tenant_database, tenant_id, db_password
+            """, (business_id,))
+            row = cr.fetchone()
+
+        if not row:
+            return None
+
+        logger.info(f"Claimed pre-provisioned tenant stack {row[0]} for {business_id}")
+        self.env.ref('naidash_auth.ir_cron_refill_tenant_pool').sudo()._trigger()
+
+        return {
+            'tenant_database': row[0],
+            'tenant_id': row[1],
+            'db_password': row[2]
+        }
+
+    @api.model
+    def _fail_claimed_slot(self, tenant_database, tenant_id):
+        """Fail a claimed stack the signup could not take over and queue its teardown.
+        Runs on its own cursor, like the claim, so that the signup's rollback keeps it
+        """
+        with self.env.registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            env[self._name].search([('tenant_database', '=', tenant_database)]).write({'state': 'failed'})
+            env['naidash.tenant.teardown'].schedule(tenant_database, tenant_id, reason="pool stack takeover failed")
+
+        logger.warning(f"Pre-provisioned tenant stack {tenant_database} could not be taken over, it will be removed")
+
+    @api.model
+    def _recredential(self, tenant_database, tenant_id, tenant_password):
+        """Give the admin user of a claimed stack a password nobody has seen before.
+        The database role keeps the pool password, the tenant's Odoo container connects with it
+        """
+        try:
+            docker_client.exec_run(f"{tenant_database.lower()}_db", ['sh', '-c', RECREDENTIAL_SCRIPT], env={
+                'TENANT_DATABASE': tenant_database.lower(),
+                'TENANT_LOGIN': tenant_id.lower(),
+                'TENANT_PASSWORD': tenant_password
+            }, check=True)
+
+            logger.info(f"✓ Admin credentials of {tenant_database} renewed")
+            return True
+        except DockerError as e:
+            logger.error(f"Failed to renew the admin credentials of {tenant_database}: {str(e)}")
+            return False
+
+    def _provision_slot(self):
+        """Build one stack for the pool with the tenant creation script"""
+        partner_model = self.env['res.partner'].sudo()
+        pool_name = "pool" + "".join(random.choices(string.ascii_lowercase + string.digits, k=6))
+        tenant_id, tenant_database = partner_model._generate_tenant_identifiers(pool_name)
+        db_password = partner_model._generate_tenant_password()
+
+        slot = self.create({
+            'tenant_database': tenant_database,
+            'tenant_id': tenant_id,
+            'db_password': db_password
+        })
+        self.env.cr.commit()
+
+        try:
+            result = partner_model._build_tenant_stack(tenant_database, tenant_id, db_password)
+        except Exception as e:
+            result = {"success": False, "message": str(e)}
+
+        if result["success"]:
+            slot.state = 'ready'
+            logger.info(f"Pre-provisioned tenant stack {tenant_database} is ready")
+        else:
+            slot.state = 'failed'
+            logger.error(f"Failed to pre-provision tenant stack {tenant_database}: {result['message']}")
+            self.env['naidash.tenant.teardown'].schedule(tenant_database, tenant_id, reason="pool provisioning failed")
+
+        self.env.cr.commit()
+
+    @api.model
+    def _fail_stale_slots(self):
+        """Fail the stacks left provisioning by a worker that died, they would count towards the pool size forever.
+        Stacks are given `naidash_auth.tenant_pool_provisioning_timeout` minutes to build
+        """
+        timeout = int(self.env['ir.config_parameter'].sudo().get_param('naidash_auth.tenant_pool_provisioning_timeout', 60))
+        stale_slots = self.search([
+            ('state', '=', 'provisioning'),
+            ('create_date', '<', fields.Datetime.now() - timedelta(minutes=timeout))
+        ])
+
+        for slot in stale_slots:
+            logger.warning(f"Pre-provisioned tenant stack {slot.tenant_database} never finished building, removing it")
+            slot.state = 'failed'
+            self.env['naidash.tenant.teardown'].schedule(slot.tenant_database, slot.tenant_id, reason="pool provisioning interrupted")
+
+        if stale_slots:
+            self.env.cr.commit()
+
+    @api.model
+    def _cron_refill_pool(self):
+        """Top the pool up to the configured size and forget old claimed/failed stacks"""
+        self._fail_stale_slots()
+        self.search([
+            ('state', 'in', ('claimed', 'failed')),
+            ('write_date', '<', fields.Datetime.now() - timedelta(days=30))
+        ]).unlink()
+
+        missing = self._get_pool_size() - self.search_count([('state', 'in', ('provisioning', 'ready'))])
+
+        for _slot in range(max(missing, 0)):
+            self._provision_slot()
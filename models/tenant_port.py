@@ -0,0 +1,208 @@
+import logging
+import os
+import re
+import subprocess
+import tempfile
+
+from datetime import timedelta
+from odoo import models, fields, api, _, SUPERUSER_ID
+from odoo.exceptions import UserError
+
+logger = logging.getLogger(__name__)
+
+# First port handed out to a tenant's Odoo container
+TENANT_BASE_PORT = 8071
+
+# Entries of the nginx `business_id -> port` map, included by the map block of the site configuration
+TENANT_PORTS_CONF = '/etc/nginx/conf.d/tenant_ports.conf'
+NGINX_MAP_ENTRY = re.compile(r'(\S+)\s+(\d+);')
+
+
+class NaidashTenantPort(models.Model):
+    _name = "naidash.tenant.port"
+    _description = "Tenant Port Assignment"
+    _order = "port asc"
+    _rec_name = "tenant_database"
+
+    tenant_database = fields.Char(string="Tenant Database", required=True)
+    business_id = fields.Char(string="Business ID")
+    port = fields.Integer(string="Port", required=True)
+    partner_id = fields.Many2one('res.partner', string="Partner", ondelete='set null')
+    nginx_configured = fields.Boolean(string="In Nginx Map", default=False)
+    # Released tenants are archived until their entry is removed from the nginx map
+    active = fields.Boolean(string="Active", default=True)
+
+    _sql_constraints = [
+        ('tenant_database_unique', 'unique(tenant_database)', 'A tenant database can only have one port'),
+        ('business_id_unique', 'unique(business_id)', 'A business can only have one port'),
+        ('port_unique', 'unique(port)', 'A port can only be assigned to one tenant'),
+    ]
+
+    @api.model
+    def _allocate(self, tenant_database, business_id=None, port=None, nginx_configured=False):
+        """Return the port of a tenant database, assigning the next free one (or `port`) on first use.
+        Allocations are serialized by an advisory lock and committed on their own cursor, so a port
+        is never handed out twice and stays assigned for the lifetime of the tenant.
+        A requested `port` that is already taken raises, the tenant is listening on it
+        """
+        tenant_database = tenant_database.lower()
+
+        with self.env.registry.cursor() as cr:
+            cr.execute("SELECT pg_advisory_xact_lock(hashtext('naidash_tenant_port'))")
+            cr.execute("SELECT port FROM naidash_tenant_port WHERE tenant_database = %s", (tenant_database,))
+            row = cr.fetchone()
+
+            if row:
+                return row[0]
+
+            if port:
+                cr.execute("SELECT 1 FROM naidash_tenant_port WHERE port = %s", (port,))
+                if cr.fetchone():
+                    raise UserError(_("Port %s requested for tenant %s is already assigned", port, tenant_database))
+            else:
+                cr.execute("SELECT GREATEST(COALESCE(MAX(port) + 1, %s), %s) FROM naidash_tenant_port", (TENANT_BASE_PORT, TENANT_BASE_PORT))
+                port = cr.fetchone()[0]
+
+            api.Environment(cr, SUPERUSER_ID, {})[self._name].create({
+                'tenant_database': tenant_database,
+                'business_id': business_id,
+                'port': port,
+                'nginx_configured': nginx_configured
+            })
+
+        logger.info(f"Assigned port {port} to tenant {tenant_database}")
+        if business_id and not nginx_configured:
+            self._schedule_nginx_sync()
+        return port
+
+    @api.model
+    def _assign(self, tenant_database, business_id, partner_id):
+        """Attach a tenant's port to the business that owns it, the routing table picks it up from here"""
+        assignment = self.sudo().search([('tenant_database', '=', tenant_database.lower())], limit=1)
+
+        if assignment:
+            # A released tenant may still hold the business ID until the next map sync
+            self.sudo().with_context(active_test=False).search([
+                ('business_id', '=', business_id), ('active', '=', False)
+            ]).unlink()
+            assignment.write({'business_id': business_id, 'partner_id': partner_id, 'nginx_configured': False})
+            self.env.registry.clear_cache()
+            self._schedule_nginx_sync()
+
+    @api.model
+    def _update_port(self, tenant_database, port):
+        """Record the port a tenant's container was actually published on"""
+        assignment = self.sudo().search([('tenant_database', '=', tenant_database.lower())], limit=1)
+
+        if assignment and assignment.port != port:
+            logger.warning(f"Tenant {tenant_database} was published on port {port} instead of {assignment.port}")
+            assignment.write({'port': port, 'nginx_configured': False})
+            self.env.registry.clear_cache()
+            self._schedule_nginx_sync()
+
+    @api.model
+    def _release(self, tenant_database):
+        """Forget the port of a tenant that was torn down. Routed tenants are archived, the next
+        map sync drops their entry and deletes them
+        """
+        assignments = self.sudo().search([('tenant_database', '=', tenant_database.lower())])
+        routed = assignments.filtered('business_id')
+
+        (assignments - routed).unlink()
+        if routed:
+            routed.write({'active': False})
+            self.env.registry.clear_cache()
+            self._schedule_nginx_sync()
+
+    # === Nginx port map ===
+    @api.model
+    def _schedule_nginx_sync(self):
+        """Ask for the nginx map to be regenerated. Requests made within the debounce delay
+        (`naidash_auth.nginx_reload_debounce` seconds) are coalesced into one rewrite and one reload
+        """
+        debounce = int(self.env['ir.config_parameter'].sudo().get_param('naidash_auth.nginx_reload_debounce', 10))
+        self.env.ref('naidash_auth.ir_cron_sync_nginx_map').sudo()._trigger(
+            at=fields.Datetime.now() + timedelta(seconds=debounce)
+        )
+
+    @api.model
+    def _render_nginx_map(self, previous_content, released_business_ids):
+        """Render the map of the registered tenants. Entries of the current map that are neither
+        registered nor explicitly released are kept, an incomplete registry never unroutes a tenant
+        """
+        entries = {
+            assignment['business_id']: assignment['port']
+            for assignment in self.sudo().search_read([('business_id', '!=', False)], ['business_id', 'port'])
+        }
+
+        for business_id, port in NGINX_MAP_ENTRY.findall(previous_content or ''):
+            if business_id not in entries and business_id not in released_business_ids:
+                logger.warning(f"Keeping nginx map entry {business_id} -> {port}, it is not in the port registry")
+                entries[business_id] = int(port)
+
+        return "".join(f"    {business_id}     {entries[business_id]};\n" for business_id in sorted(entries))
+
+    @api.model
+    def _write_nginx_map(self, content):
+        """Replace the map file atomically, readers see either the old or the new file.
+        The new file is staged in `naidash_auth.nginx_map_staging_dir` (the map's directory by default), which the
+        Odoo user must be able to write to and which must be on the map's filesystem for the rename to be atomic
+        """
+        staging_dir = self.env['ir.config_parameter'].sudo().get_param(
+            'naidash_auth.nginx_map_staging_dir', os.path.dirname(TENANT_PORTS_CONF)
+        )
+        fd, temp_path = tempfile.mkstemp(dir=staging_dir, prefix='.tenant_ports.', suffix='.tmp')
+
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, TENANT_PORTS_CONF)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+    @api.model
+    def _cron_sync_nginx_map(self):
+        """Regenerate the nginx map from the registry and reload nginx once, only when something changed.
+        A map nginx rejects is rolled back so that the running configuration keeps working
+        """
+        try:
+            with open(TENANT_PORTS_CONF, 'r') as f:
+                previous_content = f.read()
+        except FileNotFoundError:
+            previous_content = None
+
+        released = self.sudo().with_context(active_test=False).search([('active', '=', False)])
+        content = self._render_nginx_map(previous_content, set(released.mapped('business_id')))
+
+        # A map written by a run whose reload failed still has unconfigured entries
+        pending = self.sudo().search([('business_id', '!=', False), ('nginx_configured', '=', False)])
+        if content == previous_content and not pending:
+            released.unlink()
+            return
+
+        if content != previous_content:
+            self._write_nginx_map(content)
+
+        test_result = subprocess.run(['sudo', 'nginx', '-t'], capture_output=True, text=True)
+        if test_result.returncode != 0:
+            logger.error(f"nginx rejected the regenerated tenant port map: {test_result.stderr}")
+            if previous_content is not None and content != previous_content:
+                self._write_nginx_map(previous_content)
+            return
+
+        reload_result = subprocess.run(['sudo', 'nginx', '-s', 'reload'], capture_output=True, text=True)
+        if reload_result.returncode != 0:
+            logger.error(f"Failed to reload nginx: {reload_result.stderr}")
+            return
+
+        logger.info(f"Regenerated the nginx tenant port map ({len(content.splitlines())} tenant(s)) and reloaded nginx")
+
+        released.unlink()
+        if pending:
+            pending.write({'nginx_configured': True})
+            self.env.registry.clear_cache()
@@ -0,0 +1,94 @@
+import logging
+
+from datetime import timedelta
+from odoo import models, fields, api, SUPERUSER_ID
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, in seconds, of the provisioning stage duration histogram buckets
+STAGE_DURATION_BUCKETS = (1, 2, 5, 10, 30, 60, 120, 300, 600, 900)
+
+
+class NaidashTenantStageTiming(models.Model):
+    _name = "naidash.tenant.stage.timing"
+    _description = "Tenant Provisioning Stage Timing"
+    _order = "id desc"
+
+    stage = fields.Char(string="Stage", required=True, index=True)
+    duration = fields.Float(string="Duration (s)", required=True)
+    success = fields.Boolean(string="Succeeded", default=False)
+    started_at = fields.Datetime(string="Started At", required=True)
+    tenant_database = fields.Char(string="Tenant Database", index=True)
+    job_id = fields.Many2one('naidash.tenant.job', string="Provisioning Job", ondelete='set null')
+    partner_id = fields.Many2one('res.partner', string="Partner", ondelete='set null')
+
+    @api.model
+    def _record(self, stage, duration, success, started_at, tenant_database=None, job_id=None):
+        """Persist a stage timing on its own cursor, so that it survives a rolled back provisioning"""
+        with self.env.registry.cursor() as cr:
+            api.Environment(cr, SUPERUSER_ID, {})[self._name].create({
+                'stage': stage,
+                'duration': duration,
+                'success': success,
+                'started_at': started_at,
+                'tenant_database': tenant_database,
+                'job_id': job_id
+            })
+
+        logger.info(f"Provisioning stage {stage} of {tenant_database or 'a new tenant'} took {duration:.2f}s")
+
+    @api.model
+    def _link_partner(self, partner_id, tenant_database, job_id=None):
+        """Attach the timings of a provisioning to the partner it created"""
+        domain = [('tenant_database', '=', tenant_database)]
+        if job_id:
+            domain = ['|', ('job_id', '=', job_id)] + domain
+
+        self.sudo().search([('partner_id', '=', False)] + domain).write({'partner_id': partner_id})
+
+    @api.model
+    def get_stage_histograms(self, days=30):
+        """Return, per stage, the cumulative duration histogram, count, sum and p50/p95 of the last `days` days"""
+        try:
+            data = dict()
+            response_data = dict()
+
+            bucket_columns = ", ".join(
+                f"count(*) FILTER (WHERE duration <= {bound})" for bound in STAGE_DURATION_BUCKETS
+            )
+            self.env.cr.execute(f"""
+                SELECT stage,
+                       count(*),
+                       sum(duration),
+                       percentile_cont(0.5) WITHIN GROUP (ORDER BY duration),
+                       percentile_cont(0.95) WITHIN GROUP (ORDER BY duration),
+                       count(*) FILTER (WHERE NOT success),
+                       {bucket_columns}
+                  FROM naidash_tenant_stage_timing
+                 WHERE started_at >= %s
+                 GROUP BY stage
+                 ORDER BY stage
+            """, (fields.Datetime.now() - timedelta(days=int(days)),))
+
+            for row in self.env.cr.fetchall():
+                stage, count, total, p50, p95, failures = row[:6]
+                buckets = {str(bound): bucket_count for bound, bucket_count in zip(STAGE_DURATION_BUCKETS, row[6:])}
+                buckets["+Inf"] = count
+
+                data[stage] = {
+                    "count": count,
+                    "failures": failures,
+                    "sum": round(total, 3),
+                    "p50": round(p50, 3),
+                    "p95": round(p95, 3),
+                    "buckets": buckets
+                }
+
+            response_data["code"] = 200
+            response_data["message"] = "Success"
+            response_data["data"] = data
+
+            return response_data
+        except Exception as e:
+            logger.error(f"The following error ocurred while computing the provisioning stage histograms:\n\n{str(e)}")
+            raise e
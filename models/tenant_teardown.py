@@ -0,0 +1,258 @@
+import logging
+import os
+import re
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from odoo import models, fields, api, _, SUPERUSER_ID
+from odoo.exceptions import UserError
+from odoo.tools import str2bool
+
+logger = logging.getLogger(__name__)
+
+# Tenant names end with the minute they were generated at, see res.partner `_generate_tenant_identifiers`
+TENANT_NAME_PATTERN = re.compile(r'^tdb_(?P<name>.+)_(?P<timestamp>\d{10})$')
+
+
+class NaidashTenantTeardown(models.Model):
+    _name = "naidash.tenant.teardown"
+    _description = "Tenant Teardown"
+    _order = "id asc"
+
+    state = fields.Selection(
+        [
+            ('queued', 'Queued'),
+            ('running', 'Running'),
+            ('done', 'Done'),
+            ('failed', 'Failed')
+        ],
+        string="Status",
+        default='queued',
+        required=True,
+        index=True
+    )
+    tenant_database = fields.Char(string="Tenant Database", required=True, index=True)
+    tenant_id = fields.Char(string="Tenant ID", required=True)
+    reason = fields.Char(string="Reason")
+    attempts = fields.Integer(string="Attempts", default=0)
+    error_message = fields.Text(string="Error Message")
+    started_at = fields.Datetime(string="Started At")
+
+    def _get_teardown_limits(self):
+        """Return the (max parallel teardowns, max attempts per teardown) system parameters"""
+        config = self.env['ir.config_parameter'].sudo()
+        max_parallel = int(config.get_param('naidash_auth.teardown_max_parallel', 2))
+        max_attempts = int(config.get_param('naidash_auth.teardown_max_attempts', 5))
+        return max(max_parallel, 1), max(max_attempts, 1)
+
+    @api.model
+    def schedule(self, tenant_database, tenant_id, reason=None):
+        """Queue the removal of a tenant's containers, directory, database and role.
+        A tenant already waiting for its teardown is not queued twice
+        """
+        tenant_database = tenant_database.lower()
+        teardown = self.sudo().search([
+            ('tenant_database', '=', tenant_database),
+            ('state', 'in', ('queued', 'running'))
+        ], limit=1)
+
+        if not teardown:
+            teardown = self.sudo().create({
+                'tenant_database': tenant_database,
+                'tenant_id': tenant_id,
+                'reason': reason
+            })
+            logger.info(f"Queued the teardown of tenant {tenant_database} ({reason or 'no reason given'})")
+
+        self.env.ref('naidash_auth.ir_cron_run_tenant_teardowns').sudo()._trigger()
+        return teardown
+
+    @api.model
+    def _claim_next_teardown(self):
+        """Atomically move the oldest queued teardown to running, concurrent runners skip locked rows"""
+        self.env.cr.execute("""
+            UPDATE naidash_tenant_teardown
+               SET state = 'running', attempts = attempts + 1, started_at = (now() at time zone 'UTC')
+             WHERE id = (
+                SELECT id FROM naidash_tenant_teardown
+                 WHERE state = 'queued'
+                 ORDER BY id
+                 LIMIT 1
+                   FOR UPDATE SKIP LOCKED
+             )
+            RETURNING id
+        """)
+        row = self.env.cr.fetchone()
+        self.env.cr.commit()
+        return row[0] if row else None
+
+    def _run_teardown(self, teardown_id):
+        """Tear one tenant down on a dedicated cursor, called from the reaper threads"""
+        with self.env.registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            teardown = env[self._name].browse(teardown_id)
+            max_attempts = teardown._get_teardown_limits()[1]
+
+            try:
+                if not env['res.partner']._cleanup_failed_tenant(teardown.tenant_database, teardown.tenant_id):
+                    raise UserError(_("Some of the tenant resources could not be removed, see the server log"))
+
+                env['naidash.tenant.port']._release(teardown.tenant_database)
+                teardown.write({'state': 'done', 'error_message': False})
+            except Exception as e:
+                cr.rollback()
+                logger.exception(f"Teardown of tenant {teardown.tenant_database} failed: {str(e)}")
+                teardown.write({
+                    'state': 'failed' if teardown.attempts >= max_attempts else 'queued',
+                    'error_message': str(e)
+                })
+
+    @api.model
+    def _requeue_stale_teardowns(self, max_runtime_minutes=30):
+        """Queue again the teardowns left running by a reaper that died"""
+        stale_teardowns = self.sudo().search([
+            ('state', '=', 'running'),
+            ('started_at', '<', fields.Datetime.now() - timedelta(minutes=max_runtime_minutes))
+        ])
+
+        if stale_teardowns:
+            logger.warning(f"Requeueing {len(stale_teardowns)} interrupted tenant teardown(s)")
+            stale_teardowns.write({'state': 'queued'})
+            self.env.cr.commit()
+
+    @api.model
+    def _cron_run_teardowns(self):
+        """Run the queued teardowns, at most `naidash_auth.teardown_max_parallel` at a time"""
+        self._requeue_stale_teardowns()
+        max_parallel = self._get_teardown_limits()[0]
+
+        with ThreadPoolExecutor(max_workers=max_parallel, thread_name_prefix='naidash_tenant_teardown') as executor:
+            while True:
+                teardown_ids = []
+                while len(teardown_ids) < max_parallel:
+                    teardown_id = self._claim_next_teardown()
+                    if not teardown_id:
+                        break
+                    teardown_ids.append(teardown_id)
+
+                if not teardown_ids:
+                    break
+
+                list(executor.map(self._run_teardown, teardown_ids))
+
+        # Forget the finished teardowns after a while
+        self.sudo().search([
+            ('state', '=', 'done'),
+            ('write_date', '<', fields.Datetime.now() - timedelta(days=30))
+        ]).unlink()
+
+    # === Reconciliation ===
+    @api.model
+    def _get_known_tenant_databases(self):
+        """Lowercased names of every tenant database something still refers to"""
+        known = set()
+
+        partners = self.env['res.partner'].sudo().with_context(active_test=False).search_read(
+            [('partner_database_name', '!=', False)], ['partner_database_name']
+        )
+        known.update(partner['partner_database_name'].lower() for partner in partners)
+
+        slots = self.env['naidash.tenant.pool'].sudo().search_read(
+            [('state', 'in', ('provisioning', 'ready', 'claimed'))], ['tenant_database']
+        )
+        known.update(slot['tenant_database'].lower() for slot in slots)
+
+        return known
+
+    @api.model
+    def _is_past_grace_period(self, tenant_database, grace_hours):
+        """Tenants younger than the grace period may still be under construction"""
+        match = TENANT_NAME_PATTERN.match(tenant_database)
+
+        if not match:
+            return False
+
+        created_at = datetime.strptime(match.group('timestamp'), '%y%m%d%H%M')
+        return created_at < datetime.now() - timedelta(hours=grace_hours)
+
+    @api.model
+    def _get_recorded_tenant_databases(self):
+        """Lowercased names of every tenant database this instance provisioned itself, only those are ever reconciled"""
+        recorded = set()
+
+        assignments = self.env['naidash.tenant.port'].sudo().with_context(active_test=False).search_read([], ['tenant_database'])
+        recorded.update(assignment['tenant_database'].lower() for assignment in assignments)
+
+        slots = self.env['naidash.tenant.pool'].sudo().search_read([], ['tenant_database'])
+        recorded.update(slot['tenant_database'].lower() for slot in slots)
+
+        return recorded
+
+    @api.model
+    def _remove_abandoned_signups(self):
+        """Queue the teardown of the companies whose provisioning was abandoned for
+        `naidash_auth.abandoned_provisioning_days` days, and delete them. These are this instance's own records
+        """
+        abandoned_days = int(self.env['ir.config_parameter'].sudo().get_param('naidash_auth.abandoned_provisioning_days', 7))
+        abandoned_partners = self.env['res.partner'].sudo().with_context(active_test=False).search([
+            ('is_company', '=', True),
+            ('active', '=', False),
+            ('tenant_provisioning_step', 'not in', (False, 'done')),
+            ('write_date', '<', fields.Datetime.now() - timedelta(days=abandoned_days))
+        ])
+
+        for partner in abandoned_partners:
+            if partner.partner_database_name and partner.partner_primary_id:
+                self.schedule(partner.partner_database_name, partner.partner_primary_id, reason="abandoned provisioning")
+
+        if abandoned_partners:
+            logger.info(f"Removing {len(abandoned_partners)} abandoned company signup(s)")
+            abandoned_partners.unlink()
+
+    @api.model
+    def _cron_reconcile_tenants(self):
+        """Queue the teardown of abandoned company signups, then compare `~/tenants`, the Postgres databases and
+        the partner records for tenant directories and databases this instance provisioned but nothing refers to anymore.
+        The orphan scan is disabled unless `naidash_auth.reconcile_enabled` is set, and only logs what it would
+        remove while `naidash_auth.reconcile_dry_run` is (the default)
+        """
+        self._remove_abandoned_signups()
+
+        config = self.env['ir.config_parameter'].sudo()
+        if not str2bool(config.get_param('naidash_auth.reconcile_enabled', 'False')):
+            logger.info("Orphaned tenant reconciliation is disabled, set naidash_auth.reconcile_enabled to enable it")
+            return
+
+        dry_run = str2bool(config.get_param('naidash_auth.reconcile_dry_run', 'True'))
+        grace_hours = int(config.get_param('naidash_auth.reconcile_grace_hours', 6))
+        partner_model = self.env['res.partner'].sudo()
+
+        known = self._get_known_tenant_databases()
+        orphans = set()
+
+        # Tenant directories
+        tenants_dir = os.path.join(os.path.expanduser('~'), 'tenants')
+        if os.path.isdir(tenants_dir):
+            orphans.update(name.lower() for name in os.listdir(tenants_dir))
+
+        # Tenant databases
+        with partner_model._get_postgres_connection() as conn, conn.cursor() as cur:
+            cur.execute(r"SELECT datname FROM pg_database WHERE datname LIKE 'tdb\_%'")
+            orphans.update(row[0] for row in cur.fetchall())
+
+        # Other installations sharing the server or the home directory have tenants of their own
+        orphans = {
+            tenant_database for tenant_database in (orphans & self._get_recorded_tenant_databases()) - known
+            if self._is_past_grace_period(tenant_database, grace_hours)
+        }
+
+        if dry_run:
+            logger.info(f"Tenant reconciliation (dry run) would tear down {len(orphans)} orphan(s): {sorted(orphans)}")
+            return
+
+        for tenant_database in sorted(orphans):
+            match = TENANT_NAME_PATTERN.match(tenant_database)
+            tenant_id = f"tid_{match.group('name')}_{match.group('timestamp')}"
+            self.schedule(tenant_database, tenant_id, reason="orphaned")
+
+        logger.info(f"Tenant reconciliation queued {len(orphans)} orphan(s)")
@@ -10,6 +10,8 @@ from odoo.addons.auth_signup.models.res_partner import now
 from odoo.tools import email_normalize
 from odoo.http import request, SessionExpiredException
 
+from .role_resolver import role_resolver, parse_role_priority
+
 logger = logging.getLogger(__name__)
 
 
@@ -389,4 +391,46 @@ class NaidashUser(models.Model):
                 })
         
         return result
-    
\ No newline at end of file
+    
+    
+    @api.model
+    def get_login_bundle(self):
+        """Return everything an external login needs about the current user in one payload:
+        the session details, the group and partner tag names and the resolved primary role
+        """
+        user = self.env.user
+        group_names, tag_names, user_role = self._get_login_roles(user.id, self._get_role_priority())
+        
+        return {
+            'uid': user.id,
+            'partner_id': user.partner_id.id,
+            'name': user.name,
+            'is_admin': user._is_admin(),
+            'is_system': user._is_system(),
+            'user_context': self.env['res.users'].context_get(),
+            'groups': list(group_names),
+            'tags': list(tag_names),
+            'roles': [{"role": name} for name in group_names + tag_names],
+            'role': user_role
+        }
+    
+    @api.model
+    @tools.ormcache('uid', 'role_priority')
+    def _get_login_roles(self, uid, role_priority):
+        """Return the group names, partner tag names and primary role of a user.
+        Names are read in English, the role priority table matches them. Cached until the user's groups or partner tags change
+        """
+        user = self.sudo().with_context(lang='en_US').browse(uid)
+        
+        group_names = tuple(user.groups_id.mapped('name'))
+        tag_names = tuple(user.partner_id.category_id.mapped('name'))
+        user_role = role_resolver.resolve(group_names + tag_names, user._is_admin(), role_priority)
+        
+        return group_names, tag_names, user_role
+    
+    @api.model
+    def _get_role_priority(self):
+        """Return the role priority table configured in the `naidash_auth.role_priority` system parameter"""
+        return parse_role_priority(
+            self.env['ir.config_parameter'].sudo().get_param('naidash_auth.role_priority')
+        )
@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+
+from . import test_tenant_bootstrap
+from . import test_auth_login
+from . import test_docker_client
+from . import test_partner_index_benchmark
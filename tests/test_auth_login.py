@@ -0,0 +1,43 @@
+import json
+
+from odoo.tests.common import HttpCase, new_test_user, tagged
+
+from ..controllers.auth import CENTRAL_LOGIN_QUERY_BUDGET, NaidashAuthController
+
+
+@tagged('post_install', '-at_install')
+class TestAuthLogin(HttpCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = new_test_user(cls.env, login='naidash_login', password='naidash_login_pwd')
+
+    def _login(self):
+        return self.url_open('/api/v1/auth/login', data=json.dumps({
+            'jsonrpc': '2.0',
+            'id': 1,
+            'params': {'login': 'naidash_login', 'password': 'naidash_login_pwd'}
+        }), headers={'Content-Type': 'application/json'})
+
+    def test_central_login_data_query_budget(self):
+        """The user details of a cold login stay within the query budget"""
+        self.env.invalidate_all()
+        self.env.registry.clear_cache()
+        env = self.env(user=self.user)
+
+        with self.assertQueryCount(CENTRAL_LOGIN_QUERY_BUDGET):
+            data = NaidashAuthController()._central_login_data(env, 'naidash_login', env.cr.dbname, 'sid')
+
+        self.assertEqual(data['uid'], self.user.id)
+        self.assertFalse(data['is_system'])
+
+    def test_central_login_within_query_budget(self):
+        """A central login over HTTP succeeds without the over-budget warning"""
+        self.authenticate(None, None)
+
+        with self.assertNoLogs('odoo.addons.naidash_auth.controllers.auth', level='WARNING'):
+            response = self._login()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['result']['data']['uid'], self.user.id)
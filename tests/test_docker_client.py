@@ -0,0 +1,158 @@
+import json
+import os
+import shutil
+import socketserver
+import tempfile
+import threading
+
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+from odoo.tests.common import BaseCase, tagged
+
+from ..models.docker_client import DockerClient, DockerError, STREAM_HEADER, DOCKER_API_VERSION
+
+
+def frame(stream_type, payload):
+    return STREAM_HEADER.pack(stream_type, len(payload)) + payload
+
+
+class FakeDockerHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _handle(self):
+        url = urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        self.server.requests.append((self.command, url.path, parse_qs(url.query), json.loads(body) if body else None))
+
+        status, payload = self.server.routes.get((self.command, url.path), (404, {'message': 'page not found'}))
+        if not isinstance(payload, bytes):
+            payload = json.dumps(payload).encode()
+
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        if payload:
+            self.wfile.write(payload)
+
+    do_GET = do_POST = do_DELETE = _handle
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeDockerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path):
+        super().__init__(socket_path, FakeDockerHandler)
+        self.routes = {}
+        self.requests = []
+
+
+@tagged('post_install', '-at_install')
+class TestDockerClient(BaseCase):
+    """DockerClient against a fake Docker Engine API served on a Unix socket"""
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        self.server = FakeDockerServer(os.path.join(directory, 'docker.sock'))
+        thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        self.client = DockerClient(socket_path=self.server.server_address, timeout=5)
+        self.addCleanup(self.client._reset_connection)
+
+    def route(self, method, path, status, payload):
+        self.server.routes[(method, f"/{DOCKER_API_VERSION}{path}")] = (status, payload)
+
+    def test_exec_run_demultiplexes_streams(self):
+        self.route('POST', '/containers/tdb_acme_db/exec', 201, {'Id': 'exec1'})
+        self.route('POST', '/exec/exec1/start', 200, b''.join([
+            frame(1, b'first '),
+            frame(2, b'warning\n'),
+            frame(1, b'line\n'),
+        ]))
+        self.route('GET', '/exec/exec1/json', 200, {'ExitCode': 0})
+
+        result = self.client.exec_run('tdb_acme_db', ['psql', '-c', 'SELECT 1'], env={'PGUSER': 'postgres'})
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(result.stdout, 'first line\n')
+        self.assertEqual(result.stderr, 'warning\n')
+
+        create_exec = self.server.requests[0][3]
+        self.assertEqual(create_exec['Cmd'], ['psql', '-c', 'SELECT 1'])
+        self.assertEqual(create_exec['Env'], ['PGUSER=postgres'])
+
+    def test_exec_run_check_raises_on_failure(self):
+        self.route('POST', '/containers/tdb_acme_db/exec', 201, {'Id': 'exec1'})
+        self.route('POST', '/exec/exec1/start', 200, frame(2, b'psql: error\n'))
+        self.route('GET', '/exec/exec1/json', 200, {'ExitCode': 2})
+
+        self.assertEqual(self.client.exec_run('tdb_acme_db', ['psql']).exit_code, 2)
+
+        with self.assertRaisesRegex(DockerError, 'psql: error'):
+            self.client.exec_run('tdb_acme_db', ['psql'], check=True)
+
+    def test_error_statuses(self):
+        self.route('GET', '/containers/tdb_gone_odoo/json', 404, {'message': 'No such container'})
+        self.route('POST', '/containers/tdb_gone_odoo/exec', 409, {'message': 'container is not running'})
+
+        self.assertIsNone(self.client.inspect_container('tdb_gone_odoo'))
+        self.assertFalse(self.client.container_running('tdb_gone_odoo'))
+
+        with self.assertRaises(DockerError) as error:
+            self.client.exec_run('tdb_gone_odoo', ['true'])
+
+        self.assertEqual(error.exception.status, 409)
+        self.assertIn('container is not running', str(error.exception))
+
+    def test_published_port(self):
+        self.route('GET', '/containers/tdb_acme_odoo/json', 200, {
+            'State': {'Status': 'running'},
+            'NetworkSettings': {'Ports': {'8069/tcp': [{'HostIp': '0.0.0.0', 'HostPort': '8075'}]}}
+        })
+
+        self.assertTrue(self.client.container_running('tdb_acme_odoo'))
+        self.assertEqual(self.client.published_port('tdb_acme_odoo', 8069), 8075)
+        self.assertIsNone(self.client.published_port('tdb_acme_odoo', 8072))
+
+    def test_remove_compose_project(self):
+        self.route('GET', '/containers/json', 200, [
+            {'Id': 'c1', 'Labels': {'com.docker.compose.project': 'tdb_acme'}},
+            {'Id': 'c2', 'Labels': {'com.docker.compose.project': 'tdb_acme'}},
+        ])
+        self.route('DELETE', '/containers/c1', 204, b'')
+        self.route('DELETE', '/containers/c2', 404, {'message': 'already removed'})
+        self.route('GET', '/networks', 200, [{'Id': 'n1'}])
+        self.route('DELETE', '/networks/n1', 204, b'')
+
+        self.assertEqual(self.client.remove_compose_project('/home/naidash/tenants/tdb_acme'), 2)
+
+        list_filters = json.loads(self.server.requests[0][2]['filters'][0])
+        self.assertEqual(list_filters, {'label': ['com.docker.compose.project.working_dir=/home/naidash/tenants/tdb_acme']})
+
+        deletions = [(method, path) for method, path, params, body in self.server.requests if method == 'DELETE']
+        self.assertEqual(deletions, [
+            ('DELETE', f'/{DOCKER_API_VERSION}/containers/c1'),
+            ('DELETE', f'/{DOCKER_API_VERSION}/containers/c2'),
+            ('DELETE', f'/{DOCKER_API_VERSION}/networks/n1'),
+        ])
+
+        network_filters = json.loads(self.server.requests[3][2]['filters'][0])
+        self.assertEqual(network_filters, {'label': ['com.docker.compose.project=tdb_acme']})
+
+    def test_remove_compose_project_failure(self):
+        self.route('GET', '/containers/json', 500, {'message': 'daemon error'})
+
+        with self.assertRaises(DockerError) as error:
+            self.client.remove_compose_project('/home/naidash/tenants/tdb_acme')
+
+        self.assertEqual(error.exception.status, 500)
@@ -0,0 +1,52 @@
+import logging
+import time
+
+from odoo.tests.common import TransactionCase, tagged
+from odoo.tools import SQL
+
+logger = logging.getLogger(__name__)
+
+PARTNER_COUNT = 100000
+COMPANY_EVERY = 10
+
+
+@tagged('post_install', '-at_install', '-standard', 'naidash_benchmark')
+class TestPartnerIndexBenchmark(TransactionCase):
+    """Tenant lookups on 100k partners, run with `--test-tags naidash_benchmark`"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env.cr.execute("""
+            INSERT INTO res_partner (name, complete_name, type, active, is_company, business_id, create_date, write_date)
+            SELECT 'Benchmark ' || n, 'Benchmark ' || n, 'contact', true,
+                   n %% %(every)s = 0,
+                   CASE WHEN n %% %(every)s = 0 THEN 'bench' || n END,
+                   now() at time zone 'UTC', now() at time zone 'UTC'
+              FROM generate_series(1, %(count)s) AS n
+        """, {'count': PARTNER_COUNT, 'every': COMPANY_EVERY})
+        cls.env.cr.execute("ANALYZE res_partner")
+
+    def _plan_nodes(self, plan):
+        yield plan
+        for child in plan.get('Plans', []):
+            yield from self._plan_nodes(child)
+
+    def test_lookup_uses_business_id_index(self):
+        business_id = f'bench{PARTNER_COUNT // 2}'
+        query = self.env['res.partner']._search([('business_id', '=', business_id), ('is_company', '=', True)], limit=1)
+
+        self.env.cr.execute(SQL("EXPLAIN (FORMAT JSON) %s", query.select()))
+        nodes = list(self._plan_nodes(self.env.cr.fetchone()[0][0]['Plan']))
+        logger.info(f"Tenant lookup plan: {[(node['Node Type'], node.get('Index Name')) for node in nodes]}")
+
+        self.assertFalse([node for node in nodes if node['Node Type'] == 'Seq Scan' and node['Relation Name'] == 'res_partner'])
+        # The unique constraint's index serves the lookup too, the planner usually prefers the smaller partial one
+        self.assertTrue(
+            {node.get('Index Name') for node in nodes} & {'res_partner_company_business_id_index', 'res_partner_business_id_unique'}
+        )
+
+        start = time.perf_counter()
+        for n in range(COMPANY_EVERY, COMPANY_EVERY * 1001, COMPANY_EVERY):
+            self.assertTrue(self.env['res.partner']._lookup_tenant_by_business_id(f'bench{n}'))
+        logger.info(f"1000 tenant lookups on {PARTNER_COUNT} partners took {time.perf_counter() - start:.3f}s")
@@ -0,0 +1,47 @@
+import os
+import shutil
+import subprocess
+
+from odoo.tests.common import TransactionCase, tagged
+from odoo.tools import config
+
+from ..models.partner import BOOTSTRAP_PSQL_OPTIONS
+
+
+@tagged('post_install', '-at_install')
+class TestTenantBootstrap(TransactionCase):
+
+    def test_last_psql_line(self):
+        partner_model = self.env['res.partner']
+        self.assertEqual(partner_model._last_psql_line("DO\nGRANT\nUPDATE 1\ntid_acme_2501011200\n"), "tid_acme_2501011200")
+        self.assertEqual(partner_model._last_psql_line("tid_acme_2501011200\n\n"), "tid_acme_2501011200")
+        self.assertEqual(partner_model._last_psql_line(""), "")
+
+    def test_bootstrap_output_with_psql(self):
+        """Run a script shaped like the bootstrap SQL through the real psql with the same options"""
+        if not shutil.which('psql'):
+            self.skipTest("psql is not installed")
+
+        env = dict(os.environ)
+        if config['db_password']:
+            env['PGPASSWORD'] = config['db_password']
+
+        command = ['psql', '-d', self.env.cr.dbname, *BOOTSTRAP_PSQL_OPTIONS, '-c', """
+            DO $bootstrap$
+            BEGIN
+                PERFORM 1;
+            END
+            $bootstrap$;
+            CREATE TEMPORARY TABLE naidash_bootstrap_check (login varchar);
+            INSERT INTO naidash_bootstrap_check VALUES ('tid_acme_2501011200');
+            UPDATE naidash_bootstrap_check SET login = login;
+            SELECT login FROM naidash_bootstrap_check;
+        """]
+        for option, key in (('-h', 'db_host'), ('-p', 'db_port'), ('-U', 'db_user')):
+            if config[key]:
+                command[1:1] = [option, str(config[key])]
+
+        result = subprocess.run(command, capture_output=True, text=True, env=env, timeout=30)
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(self.env['res.partner']._last_psql_line(result.stdout), "tid_acme_2501011200")